@@ -158,20 +158,29 @@ QUARTERLY_DATA: List[QuarterData] = [
 ]
 
 
-def get_phase_allocation(phase: str) -> dict:
+# L1-L5 仓位配比表
+PHASE_ALLOCATIONS = {
+    # 标准相位
+    "Phase 1":  {"L1": 0.35, "L2": 0.30, "L3": 0.15, "L4": 0.10, "L5": 0.10},
+    "Phase 2":  {"L1": 0.30, "L2": 0.15, "L3": 0.20, "L4": 0.20, "L5": 0.15},
+    "Phase 3":  {"L1": 0.40, "L2": 0.10, "L3": 0.15, "L4": 0.20, "L5": 0.15},
+    "Phase 4":  {"L1": 0.20, "L2": 0.05, "L3": 0.20, "L4": 0.30, "L5": 0.25},
+    # 过渡期：渐进退出第一阶段（L2 -5%, L5 +5%）
+    "Phase 1→2": {"L1": 0.35, "L2": 0.25, "L3": 0.15, "L4": 0.10, "L5": 0.15},
+}
+
+
+def get_phase_allocation(phase: str, allocations: dict = None) -> dict:
     """
     根据相位判定返回 L1-L5 仓位配比。
     在过渡期使用介于两个相位之间的配比。
+    allocations: 自定义配比表（默认 PHASE_ALLOCATIONS）。
     """
-    allocations = {
-        # 标准相位
-        "Phase 1":  {"L1": 0.35, "L2": 0.30, "L3": 0.15, "L4": 0.10, "L5": 0.10},
-        "Phase 2":  {"L1": 0.30, "L2": 0.15, "L3": 0.20, "L4": 0.20, "L5": 0.15},
-        "Phase 3":  {"L1": 0.40, "L2": 0.10, "L3": 0.15, "L4": 0.20, "L5": 0.15},
-        "Phase 4":  {"L1": 0.20, "L2": 0.05, "L3": 0.20, "L4": 0.30, "L5": 0.25},
-        # 过渡期：渐进退出第一阶段（L2 -5%, L5 +5%）
-        "Phase 1→2": {"L1": 0.35, "L2": 0.25, "L3": 0.15, "L4": 0.10, "L5": 0.15},
-    }
+    if allocations is None:
+        allocations = PHASE_ALLOCATIONS
+    if phase not in allocations and phase and "→" in phase:
+        # 没有专门配比的过渡期（如 "Phase 2→3"）维持源相位配比
+        phase = phase.split("→")[0]
     return allocations.get(phase, allocations["Phase 2"])
 
 
@@ -187,6 +196,16 @@ LAYER_TICKERS = {
 
 BENCHMARK_TICKER = "SPY"
 
+# 多基准：名称 → {标的: 权重}，多标的基准按日再平衡到固定权重
+BENCHMARKS = {
+    "SPY": {"SPY": 1.0},
+    "QQQ": {"QQQ": 1.0},
+    "60/40": {"SPY": 0.6, "AGG": 0.4},   # 股债 60/40
+    "AI Basket": {                         # L1-L3 AI 标的等权
+        t: 1.0 for layer in ("L1", "L2", "L3") for t in LAYER_TICKERS[layer]
+    },
+}
+
 # 回测时间范围
 BACKTEST_START = "2024-04-01"
 BACKTEST_END = "2026-02-27"
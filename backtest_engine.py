@@ -3,33 +3,53 @@ AIPT 回测引擎
 使用真实股票价格 + 季度指标信号进行仓位管理模拟。
 """
 
+import os
+import shutil
+from dataclasses import replace
 import pandas as pd
 import numpy as np
 import yfinance as yf
 from datetime import datetime
 from backtest_data import (
-    QUARTERLY_DATA, LAYER_TICKERS, BENCHMARK_TICKER,
-    BACKTEST_START, BACKTEST_END, DATA_FETCH_START,
+    QUARTERLY_DATA, LAYER_TICKERS, BENCHMARK_TICKER, BENCHMARKS,
+    BACKTEST_START, BACKTEST_END, DATA_FETCH_START, PHASE_ALLOCATIONS,
     get_phase_allocation,
 )
+from data_quality import DEFAULT_POLICY, DEFAULT_REFERENCE, check_prices, format_report
+from backtest_vectorized import LAYERS, quarter_index, allocation_matrix, batch_stats
+from price_store import PriceStore
+from rebalance import parse_schedule, rebalance_mask, smooth_phases, simulate_rebalanced
+from result_cache import ResultCache, stable_hash
 
+CACHE_DIR = os.path.join(os.path.dirname(__file__), "cache")
+PRICE_STORE_PATH = os.path.join(CACHE_DIR, f"prices_{DATA_FETCH_START}")
 
-def fetch_all_prices() -> pd.DataFrame:
-    """拉取所有标的 + 基准的日度收盘价。"""
+# 模拟 / 统计逻辑有改动时递增，使已缓存的回测结果自动失效
+ENGINE_VERSION = 2
+
+
+def fetch_all_prices(start: str = DATA_FETCH_START, end: str = BACKTEST_END,
+                     raw: bool = False) -> pd.DataFrame:
+    """
+    拉取所有标的 + 基准的日度收盘价。
+    raw=True 时不做前值填充，缺失值留给 data_quality.check_prices 检查与修复。
+    """
     all_tickers = []
     for tickers in LAYER_TICKERS.values():
         all_tickers.extend(tickers)
     all_tickers.append(BENCHMARK_TICKER)
+    for weights in BENCHMARKS.values():
+        all_tickers.extend(weights)
     all_tickers = list(set(all_tickers))
 
     print(f"📡 正在拉取 {len(all_tickers)} 只标的价格数据...")
     print(f"   标的: {', '.join(all_tickers)}")
-    print(f"   时间范围: {DATA_FETCH_START} → {BACKTEST_END}")
+    print(f"   时间范围: {start} → {end}")
 
     data = yf.download(
         all_tickers,
-        start=DATA_FETCH_START,
-        end=BACKTEST_END,
+        start=start,
+        end=end,
         progress=False,
         auto_adjust=True,
         group_by="ticker",
@@ -46,17 +66,65 @@ def fetch_all_prices() -> pd.DataFrame:
         except KeyError:
             print(f"   ⚠️ 无法获取 {ticker} 的数据，跳过")
 
-    closes = closes.ffill().dropna(how="all")
+    closes = closes.dropna(how="all")
+    if not raw:
+        closes = closes.ffill()
     print(f"   ✅ 获取 {len(closes)} 个交易日数据\n")
     return closes
 
 
-def compute_layer_returns(closes: pd.DataFrame) -> pd.DataFrame:
+def load_prices(refresh: bool = False, tickers: list = None,
+                start: str = None, end: str = None) -> pd.DataFrame:
+    """
+    带本地缓存的 fetch_all_prices：首次拉取后写入 cache/ 下的列式价格库（PriceStore），
+    后续回测 / 优化直接内存映射读取，可只取部分标的与日期区间。
+    库中保存未填充的原始收盘价，使用前须经 data_quality.check_prices（见 prepare_returns）。
+    """
+    path = PRICE_STORE_PATH
+    if refresh or not os.path.exists(os.path.join(path, "meta.json")):
+        closes = fetch_all_prices(raw=True)
+        if os.path.exists(path):
+            shutil.rmtree(path)
+        PriceStore.from_frame(path, closes)
+
+    closes = PriceStore(path).to_frame(tickers, start, end)
+    print(f"💾 使用缓存价格数据: {path} ({len(closes)} 个交易日)\n")
+    return closes
+
+
+def update_prices(end: str = None) -> int:
+    """
+    每日增量更新价格库：只拉取库中最后一天之后的数据并追加，返回新增交易日数。
+    end 默认为今天；库不存在时先完整建库。
+    """
+    if not os.path.exists(os.path.join(PRICE_STORE_PATH, "meta.json")):
+        load_prices(refresh=True)
+    store = PriceStore(PRICE_STORE_PATH, mode="r+")
+    last = store.dates[-1] if len(store) else pd.Timestamp(DATA_FETCH_START) - pd.Timedelta(days=1)
+    end = end or datetime.now().strftime("%Y-%m-%d")
+    start = (last + pd.Timedelta(days=1)).strftime("%Y-%m-%d")
+    if start >= end:
+        print(f"💾 价格库已是最新: {last.date()}\n")
+        return 0
+
+    closes = fetch_all_prices(start=start, end=end, raw=True)
+    closes = closes.loc[closes.index > last]
+    store.add_tickers(closes.columns)
+    store.append(closes)
+    print(f"💾 价格库追加 {len(closes)} 个交易日 → {PRICE_STORE_PATH}\n")
+    return len(closes)
+
+
+def compute_layer_returns(closes: pd.DataFrame, valid_mask: pd.DataFrame = None) -> pd.DataFrame:
     """
     计算各层每日收益率。
     每层内等权配置（如 L1 = MSFT/AMZN/GOOGL 等权）。
+    valid_mask（data_quality.check_prices 的 valid）为 False 的标的当日不参与，
+    层内权重在当日有效标的间重新等分。
     """
     daily_returns = closes.pct_change()
+    if valid_mask is not None:
+        daily_returns = daily_returns.where(valid_mask.reindex_like(daily_returns).fillna(False))
     layer_returns = pd.DataFrame(index=daily_returns.index)
 
     for layer, tickers in LAYER_TICKERS.items():
@@ -75,13 +143,159 @@ def compute_layer_returns(closes: pd.DataFrame) -> pd.DataFrame:
     return layer_returns
 
 
-def run_backtest(start_date: str = None, end_date: str = None) -> dict:
+def compute_benchmark_returns(closes: pd.DataFrame, benchmarks: dict = None,
+                              valid_mask: pd.DataFrame = None) -> pd.DataFrame:
+    """
+    计算多基准每日收益率（列 = 基准名称）。
+    组合基准（如 60/40）按日再平衡，缺失标的的权重在可用标的间重新归一化；
+    给出 valid_mask 时按日在有效标的间重新归一化。
+    """
+    if benchmarks is None:
+        benchmarks = BENCHMARKS
+
+    daily_returns = closes.pct_change()
+    if valid_mask is not None:
+        daily_returns = daily_returns.where(valid_mask.reindex_like(daily_returns).fillna(False))
+    bench_returns = pd.DataFrame(index=daily_returns.index)
+
+    for name, weights in benchmarks.items():
+        available = pd.Series({t: w for t, w in weights.items() if t in daily_returns.columns},
+                              dtype=float)
+        if available.empty:
+            print(f"   ⚠️ 基准 {name} 无可用标的，收益记为 0")
+            bench_returns[name] = 0.0
+            continue
+        available /= available.sum()
+        if valid_mask is None:
+            bench_returns[name] = daily_returns[available.index].to_numpy() @ available.to_numpy()
+            continue
+        r = daily_returns[available.index].to_numpy()
+        ok = ~np.isnan(r)
+        w = available.to_numpy()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            bench_returns[name] = (np.where(ok, r, 0.0) @ w) / (ok @ w)
+
+    return bench_returns
+
+
+def build_quarterly_signals(phase_source: str = "labels", smoothing: str = "none") -> list:
+    """
+    生成驱动回测的季度信号：相位来源（手工标注 / 相位引擎）+ 可选信号平滑。
+    相位未变的季度保留原始记录。
+    """
+    if phase_source == "labels" and smoothing == "none":
+        return QUARTERLY_DATA
+
+    phases = smooth_phases(QUARTERLY_DATA, smoothing, phase_source)
+    if smoothing != "none":
+        suffix = f"（{smoothing} 平滑）"
+    else:
+        suffix = "（相位引擎）"
+    return [
+        qd if (phase == qd.phase and phase_source == "labels")
+        else replace(qd, phase=phase, phase_label=f"⚙️ {phase}{suffix}")
+        for qd, phase in zip(QUARTERLY_DATA, phases)
+    ]
+
+
+def simulate_strategy(layer_returns: pd.DataFrame, quarterly_data: list,
+                      rebalance="daily", allocations: dict = None) -> dict:
+    """
+    在给定各层收益上向量化模拟一套信号 + 调仓计划。
+    信号生效前的交易日不参与回测；allocations 默认 PHASE_ALLOCATIONS。
+
+    返回:
+        dict 包含 nav（归一化净值 Series）/ held（开盘实际仓位）/ closing（收盘仓位）/
+        target（目标仓位）/ rebalance_mask / phases（每日相位）/ qidx（每日季度序号）
+    """
+    qidx = quarter_index(layer_returns.index, quarterly_data)
+    keep = qidx >= 0
+    dates = layer_returns.index[keep]
+    qidx = qidx[keep]
+
+    weights = allocation_matrix([qd.phase for qd in quarterly_data], allocations)
+    target = weights[qidx]
+    schedule = parse_schedule(rebalance) if isinstance(rebalance, str) else rebalance
+    mask = rebalance_mask(dates, schedule, target)
+    nav, held, closing = simulate_rebalanced(layer_returns.loc[keep, LAYERS].to_numpy(),
+                                             target, mask)
+
+    return {
+        "nav": pd.Series(nav, index=dates),
+        "held": pd.DataFrame(held, index=dates, columns=LAYERS),
+        "closing": pd.DataFrame(closing, index=dates, columns=LAYERS),
+        "target": pd.DataFrame(target, index=dates, columns=LAYERS),
+        "rebalance_mask": mask,
+        "phases": np.array([quarterly_data[q].phase for q in qidx], dtype=object),
+        "qidx": qidx,
+    }
+
+
+def compare_rebalance_schedules(layer_returns: pd.DataFrame, rebalances: list,
+                                smoothings: list = ("none",),
+                                phase_source: str = "labels") -> pd.DataFrame:
+    """
+    在同一份各层收益上对比多组 调仓计划 × 信号平滑，返回统计表（每行一个组合）。
+    """
+    rows = []
+    for smoothing in smoothings:
+        quarterly_data = build_quarterly_signals(phase_source, smoothing)
+        for rebalance in rebalances:
+            sim = simulate_strategy(layer_returns, quarterly_data, rebalance)
+            stats = batch_stats(sim["nav"].to_numpy())
+            mask = sim["rebalance_mask"]
+            # 换手 = 调仓日 |目标 − 前一日收盘持仓| / 2（首日建仓不计）
+            closing = sim["closing"].to_numpy()
+            drift = np.abs(sim["target"].to_numpy()[1:] - closing[:-1])[mask[1:]]
+            rows.append({
+                "rebalance": rebalance,
+                "smoothing": smoothing,
+                "rebalances": int(mask.sum()),
+                "turnover": float(drift.sum() / 2),
+                **{k: float(v[0]) for k, v in stats.items()},
+            })
+    return pd.DataFrame(rows)
+
+
+def prepare_returns(closes: pd.DataFrame = None, quality_policy: dict = None) -> tuple:
+    """
+    读取价格，经数据质量检查修复后计算各层 / 多基准日收益，供多个回测区间共享。
+
+    参数:
+        closes: 未填充的原始收盘价（默认读取本地价格库 load_prices）
+        quality_policy: 覆盖 data_quality.DEFAULT_POLICY 的修复策略
+
+    返回: (layer_returns, bench_returns)
+    """
+    if closes is None:
+        closes = load_prices()
+    quality = check_prices(closes, quality_policy)
+    print(format_report(quality) + "\n")
+    closes, valid = quality["closes"], quality["valid"]
+    return (compute_layer_returns(closes, valid_mask=valid),
+            compute_benchmark_returns(closes, valid_mask=valid))
+
+
+def run_backtest(start_date: str = None, end_date: str = None,
+                 phase_source: str = "labels", rebalance="daily",
+                 smoothing: str = "none", returns: tuple = None,
+                 cache: bool = True, signals: tuple = None) -> dict:
     """
     执行回测主逻辑。
 
     参数:
         start_date: 回测起始日期 (默认使用 backtest_data 中的 BACKTEST_START)
         end_date: 回测结束日期 (默认使用 backtest_data 中的 BACKTEST_END)
+        phase_source: "labels" 使用 QUARTERLY_DATA 手工相位；
+                      "engine" 由 PhaseEngine 按相位转移图回放季度指标得出
+        rebalance: 调仓计划 daily / weekly / monthly / quarterly / signal，
+                   或 "file:<路径>" / "dates:<日期;...>"（默认 daily，即每日再平衡到目标仓位）
+        smoothing: 信号平滑 none / ma:N / vote:N
+        returns: prepare_returns 的结果；批量回测时传入以避免重复拉取与计算
+        signals: (季度数据, 仓位表)，如 phase_optimizer.params_to_quarterly 的优化结果；
+                 给出时覆盖 phase_source / smoothing 生成的季度信号与 PHASE_ALLOCATIONS
+        cache: 是否使用结果缓存（键 = 区间内价格数据 + 季度数据 + 仓位表 + 各层 / 基准标的 + 选项
+               + ENGINE_VERSION；未传 returns 时价格数据取价格库中的原始收盘价，命中时不做质量检查与收益计算）
 
     返回:
         dict 包含:
@@ -96,94 +310,140 @@ def run_backtest(start_date: str = None, end_date: str = None) -> dict:
         start_date = BACKTEST_START
     if end_date is None:
         end_date = BACKTEST_END
+    if phase_source not in ("labels", "engine"):
+        raise ValueError(f"未知相位来源: {phase_source}（可选: labels / engine）")
 
-    closes = fetch_all_prices()
-    layer_returns = compute_layer_returns(closes)
+    if signals is None:
+        quarterly_data, allocations = build_quarterly_signals(phase_source, smoothing), PHASE_ALLOCATIONS
+    else:
+        quarterly_data, allocations = signals
 
-    # 过滤回测区间
     bt_start = pd.Timestamp(start_date)
     bt_end = pd.Timestamp(end_date)
+    schedule = parse_schedule(rebalance) if isinstance(rebalance, str) else rebalance
+    result_cache = ResultCache() if cache else None
+    options = {
+        "engine_version": ENGINE_VERSION,
+        "quarterly_data": QUARTERLY_DATA,
+        "signals": quarterly_data,
+        "allocations": allocations,
+        "benchmarks": BENCHMARKS,
+        "layer_tickers": LAYER_TICKERS,
+        "benchmark_ticker": BENCHMARK_TICKER,
+        "quality_reference": DEFAULT_REFERENCE,
+        "window": (start_date, end_date),
+        "phase_source": phase_source,
+        "rebalance": schedule,
+        "smoothing": smoothing,
+    }
+
+    key = None
+    if returns is None:
+        # 质量检查始终基于价格库全部历史（与批量区间回测一致）再截取区间；
+        # 先按原始收盘价查缓存，不触发网络与质量检查
+        closes = load_prices()
+        if result_cache is not None:
+            key = stable_hash({**options, "closes": closes, "quality_policy": DEFAULT_POLICY})
+            results = _cache_hit(result_cache, key)
+            if results is not None:
+                return results
+        returns = prepare_returns(closes)
+    layer_returns, bench_returns = returns
+
+    # 过滤回测区间
     mask = (layer_returns.index >= bt_start) & (layer_returns.index <= bt_end)
     layer_returns = layer_returns.loc[mask].copy()
+    bench_returns = bench_returns.loc[mask].copy()
 
     if layer_returns.empty:
         raise ValueError("回测区间内无数据！请检查日期范围。")
 
     print(f"🔄 回测区间: {layer_returns.index[0].date()} → {layer_returns.index[-1].date()}")
-    print(f"   共 {len(layer_returns)} 个交易日\n")
-
-    # ── 初始化 ─────────────────────────────────
-    portfolio_nav = pd.Series(index=layer_returns.index, dtype=float)
-    benchmark_nav = pd.Series(index=layer_returns.index, dtype=float)
-    allocations_history = pd.DataFrame(
-        index=layer_returns.index,
-        columns=["L1", "L2", "L3", "L4", "L5"],
-        dtype=float,
-    )
-
-    portfolio_value = 1_000_000  # 100万初始资金
-    benchmark_value = 1_000_000
+    print(f"   共 {len(layer_returns)} 个交易日 | 调仓: {rebalance} | 信号平滑: {smoothing}\n")
+
+    if result_cache is not None and key is None:
+        key = stable_hash({**options, "layer_returns": layer_returns, "bench_returns": bench_returns})
+        results = _cache_hit(result_cache, key)
+        if results is not None:
+            return results
+
+    # ── 向量化模拟 ─────────────────────────────────
+    sim = simulate_strategy(layer_returns, quarterly_data, schedule, allocations)
+    if sim["nav"].empty:
+        raise ValueError("回测区间内尚无生效的季度信号！请检查日期范围。")
+    layer_returns = layer_returns.loc[sim["nav"].index]
+
+    portfolio_nav = sim["nav"] * 1_000_000  # 100万初始资金
+    bench_daily = layer_returns["Benchmark"].fillna(0.0).to_numpy().copy()
+    bench_daily[0] = 0.0
+    benchmark_nav = pd.Series(np.cumprod(1 + bench_daily) * 1_000_000, index=portfolio_nav.index)
+    allocations_history = sim["held"] * 100
+
+    # 相位切换记录
     phase_changes = []
-
-    # 确定每个交易日对应的季度数据
-    def get_quarter_data_for_date(dt):
-        """找到给定日期对应的最新季度数据"""
-        applicable = None
-        for qd in QUARTERLY_DATA:
-            if pd.Timestamp(qd.effective_date) <= dt:
-                applicable = qd
-        return applicable
-
-    current_phase = None
-
-    # ── 逐日模拟 ─────────────────────────────────
-    for i, date in enumerate(layer_returns.index):
-        qd = get_quarter_data_for_date(date)
-        if qd is None:
-            continue
-
-        # 检测相位变化
-        if qd.phase != current_phase:
-            alloc = get_phase_allocation(qd.phase)
-            phase_changes.append({
-                "date": date,
-                "quarter": qd.quarter,
-                "phase": qd.phase,
-                "label": qd.phase_label,
-                "allocation": alloc.copy(),
-                "cpi": qd.cpi,
-                "rdi": qd.rdi,
-                "mqi": qd.mqi,
-            })
-            current_phase = qd.phase
-            print(f"   📊 {date.date()} | {qd.quarter} | {qd.phase_label}")
-            print(f"      CPI={qd.cpi} RDI={qd.rdi} MQI={qd.mqi} LPI={qd.lpi}")
-            print(f"      仓位: " + " ".join(f"{k}={v*100:.0f}%" for k, v in alloc.items()))
-
-        # 计算当日组合收益
-        if i == 0:
-            portfolio_nav.iloc[i] = portfolio_value
-            benchmark_nav.iloc[i] = benchmark_value
-        else:
-            daily_ret = layer_returns.iloc[i]
-            port_ret = sum(alloc.get(layer, 0) * daily_ret.get(layer, 0)
-                          for layer in ["L1", "L2", "L3", "L4", "L5"])
-            portfolio_value *= (1 + port_ret)
-            benchmark_value *= (1 + daily_ret.get("Benchmark", 0))
-
-            portfolio_nav.iloc[i] = portfolio_value
-            benchmark_nav.iloc[i] = benchmark_value
-
-        # 记录当日仓位
-        for layer in ["L1", "L2", "L3", "L4", "L5"]:
-            allocations_history.loc[date, layer] = alloc.get(layer, 0) * 100
+    phases = sim["phases"]
+    changed = np.r_[True, phases[1:] != phases[:-1]]
+    for i in np.flatnonzero(changed):
+        date = portfolio_nav.index[i]
+        qd = quarterly_data[sim["qidx"][i]]
+        alloc = get_phase_allocation(qd.phase, allocations)
+        phase_changes.append({
+            "date": date,
+            "quarter": qd.quarter,
+            "phase": qd.phase,
+            "label": qd.phase_label,
+            "allocation": alloc.copy(),
+            "cpi": qd.cpi,
+            "rdi": qd.rdi,
+            "mqi": qd.mqi,
+            "lpi": qd.lpi,
+        })
 
     # ── 计算统计指标 ──────────────────────────────
-    portfolio_nav = portfolio_nav.dropna()
-    benchmark_nav = benchmark_nav.dropna()
-
     stats = compute_stats(portfolio_nav, benchmark_nav)
 
+    # 多基准相对指标（一次矩阵运算覆盖全部基准）
+    bench_returns = bench_returns.reindex(portfolio_nav.index).fillna(0.0)
+    bench_returns.iloc[0] = 0.0
+    benchmark_navs = (1 + bench_returns).cumprod() * 1_000_000
+    relative_stats = compute_relative_stats(portfolio_nav.pct_change().fillna(0.0), bench_returns)
+
+    results = {
+        "portfolio_nav": portfolio_nav,
+        "benchmark_nav": benchmark_nav,
+        "allocations_history": allocations_history,
+        "phase_changes": phase_changes,
+        "quarterly_data": quarterly_data,
+        "stats": stats,
+        "layer_returns": layer_returns,
+        "benchmark_navs": benchmark_navs,
+        "relative_stats": relative_stats,
+    }
+    if result_cache is not None:
+        result_cache.put(key, results)
+    _print_results(results)
+    return results
+
+
+def _cache_hit(result_cache: ResultCache, key: str):
+    """查询回测结果缓存，命中时打印结果并返回。"""
+    results = result_cache.get(key)
+    if results is not None:
+        print(f"⚡ 命中回测缓存 ({key[:12]})")
+        _print_results(results)
+    return results
+
+
+def _print_results(results: dict):
+    """打印相位切换记录与回测统计摘要。"""
+    for change in results["phase_changes"]:
+        print(f"   📊 {change['date'].date()} | {change['quarter']} | {change['label']}")
+        print(f"      CPI={change['cpi']} RDI={change['rdi']} MQI={change['mqi']} LPI={change['lpi']}")
+        print(f"      仓位: " + " ".join(f"{k}={v*100:.0f}%" for k, v in change["allocation"].items()))
+
+    stats = results["stats"]
+    portfolio_nav = results["portfolio_nav"]
+    relative_stats = results["relative_stats"]
     print("\n" + "=" * 60)
     print("📈 回测统计摘要")
     print("=" * 60)
@@ -200,22 +460,24 @@ def run_backtest(start_date: str = None, end_date: str = None) -> dict:
     print(f"   {'夏普比率':20s} {stats['portfolio_sharpe']:>11.2f} {stats['benchmark_sharpe']:>11.2f}")
     print(f"")
     print(f"   🏆 超额收益: {stats['excess_return']:>+.2%}")
+    print("")
+    print(f"   {'基准':12s} {'基准收益':>9s} {'超额收益':>9s} {'Beta':>6s} {'跟踪误差':>8s} "
+          f"{'上行捕获':>8s} {'下行捕获':>8s}")
+    for name, row in relative_stats.iterrows():
+        print(f"   {name:12s} {row['benchmark_total_return']:>+9.2%} {row['excess_return']:>+9.2%} "
+              f"{row['beta']:>6.2f} {row['tracking_error']:>8.2%} "
+              f"{row['up_capture']:>8.2f} {row['down_capture']:>8.2f}")
     print("=" * 60)
 
-    return {
-        "portfolio_nav": portfolio_nav,
-        "benchmark_nav": benchmark_nav,
-        "allocations_history": allocations_history.dropna(how="all"),
-        "phase_changes": phase_changes,
-        "quarterly_data": QUARTERLY_DATA,
-        "stats": stats,
-    }
 
-
-def compute_stats(portfolio_nav: pd.Series, benchmark_nav: pd.Series) -> dict:
-    """计算回测统计指标"""
+def compute_stats(portfolio_nav: pd.Series, benchmark_nav: pd.Series,
+                  periods_per_year: float = 252) -> dict:
+    """
+    计算回测统计指标。
+    periods_per_year 为年化因子：日线 252，分钟线见 intraday.annualization_factor。
+    """
     trading_days = len(portfolio_nav)
-    years = trading_days / 252
+    years = trading_days / periods_per_year
 
     # 总收益率
     port_total = portfolio_nav.iloc[-1] / portfolio_nav.iloc[0] - 1
@@ -230,8 +492,8 @@ def compute_stats(portfolio_nav: pd.Series, benchmark_nav: pd.Series) -> dict:
     bench_daily = benchmark_nav.pct_change().dropna()
 
     # 年化波动率
-    port_vol = port_daily.std() * np.sqrt(252)
-    bench_vol = bench_daily.std() * np.sqrt(252)
+    port_vol = port_daily.std() * np.sqrt(periods_per_year)
+    bench_vol = bench_daily.std() * np.sqrt(periods_per_year)
 
     # 夏普比率 (假设无风险利率 4.5%)
     rf = 0.045
@@ -260,6 +522,53 @@ def compute_stats(portfolio_nav: pd.Series, benchmark_nav: pd.Series) -> dict:
     }
 
 
+def compute_relative_stats(portfolio_returns: pd.Series, benchmark_returns: pd.DataFrame,
+                           periods_per_year: int = 252) -> pd.DataFrame:
+    """
+    计算组合相对每个基准的指标（超额收益、Beta、跟踪误差、信息比率、上/下行捕获）。
+    基准收益整理为 基准×交易日 矩阵，所有基准一次向量化计算。
+
+    返回: DataFrame，行 = 基准名称
+    """
+    p = portfolio_returns.reindex(benchmark_returns.index).fillna(0.0).to_numpy()   # (T,)
+    b = benchmark_returns.fillna(0.0).to_numpy().T                                   # (K, T)
+
+    port_total = np.prod(1 + p) - 1
+    bench_total = np.prod(1 + b, axis=1) - 1
+
+    # Beta = Cov(p, b) / Var(b)
+    p_dev = p - p.mean()
+    b_dev = b - b.mean(axis=1, keepdims=True)
+    bench_var = (b_dev ** 2).sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        beta = np.where(bench_var > 0, b_dev @ p_dev / bench_var, np.nan)
+
+    # 跟踪误差 / 信息比率
+    active = p - b
+    ddof = 1 if active.shape[1] > 1 else 0
+    tracking_error = active.std(axis=1, ddof=ddof) * np.sqrt(periods_per_year)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        info_ratio = np.where(tracking_error > 0,
+                              active.mean(axis=1) * periods_per_year / tracking_error, np.nan)
+
+    # 上/下行捕获：基准上涨（下跌）日组合平均收益 / 基准平均收益
+    up = b > 0
+    down = b < 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        up_capture = (up * p).sum(axis=1) / (up * b).sum(axis=1)
+        down_capture = (down * p).sum(axis=1) / (down * b).sum(axis=1)
+
+    return pd.DataFrame({
+        "benchmark_total_return": bench_total,
+        "excess_return": port_total - bench_total,
+        "beta": beta,
+        "tracking_error": tracking_error,
+        "information_ratio": info_ratio,
+        "up_capture": up_capture,
+        "down_capture": down_capture,
+    }, index=benchmark_returns.columns)
+
+
 def compute_max_drawdown(nav: pd.Series) -> float:
     """计算最大回撤"""
     peak = nav.expanding().max()
@@ -32,6 +32,9 @@ COLORS = {
     "mqi": "#FF9800",
 }
 
+# 附加基准配色
+BENCHMARK_COLORS = ["#6D4C41", "#00897B", "#C2185B", "#546E7A"]
+
 PHASE_COLORS = {
     "Phase 1":   "#C8E6C9",   # 浅绿
     "Phase 1→2": "#FFF9C4",   # 浅黄
@@ -83,6 +86,17 @@ def _plot_nav_curve(results: dict, output_dir: str):
             label=f'SPY Benchmark ({stats["benchmark_total_return"]:+.1%})',
             zorder=4)
 
+    # 其余基准（QQQ / 60-40 / AI 篮子等）
+    benchmark_navs = results.get("benchmark_navs")
+    relative_stats = results.get("relative_stats")
+    if benchmark_navs is not None:
+        for name, color in zip([c for c in benchmark_navs.columns if c != "SPY"],
+                               BENCHMARK_COLORS):
+            nav = benchmark_navs[name] / benchmark_navs[name].iloc[0]
+            ax.plot(nav.index, nav.values, color=color, linewidth=1.2, linestyle=":",
+                    label=f'{name} ({relative_stats.loc[name, "benchmark_total_return"]:+.1%})',
+                    zorder=3)
+
     # 标注相位切换点
     for pc in phase_changes:
         if pc["date"] in port_norm.index:
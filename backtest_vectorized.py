@@ -0,0 +1,97 @@
+"""
+AIPT 向量化回测评估器
+将逐日循环改写为数组运算：一次计算 N 组仓位方案 × T 个交易日的净值与统计指标，
+供参数优化、批量情景扫描等需要大量重复回测的场景使用。
+"""
+
+import numpy as np
+import pandas as pd
+from backtest_data import QUARTERLY_DATA, get_phase_allocation
+
+LAYERS = ["L1", "L2", "L3", "L4", "L5"]
+
+
+def quarter_index(dates: pd.DatetimeIndex, quarterly_data=None) -> np.ndarray:
+    """
+    每个交易日对应的季度序号（QUARTERLY_DATA 下标），信号生效前为 -1。
+    """
+    if quarterly_data is None:
+        quarterly_data = QUARTERLY_DATA
+    effective = pd.DatetimeIndex([pd.Timestamp(qd.effective_date) for qd in quarterly_data])
+    return np.searchsorted(effective.values, dates.values, side="right") - 1
+
+
+def allocation_matrix(phases, allocations: dict = None) -> np.ndarray:
+    """相位序列 → (Q, 5) 仓位矩阵（小数）。"""
+    return np.array([
+        [get_phase_allocation(phase, allocations).get(layer, 0) for layer in LAYERS]
+        for phase in phases
+    ], dtype=float)
+
+
+def simulate_batch(returns: np.ndarray, qidx: np.ndarray, weights: np.ndarray,
+                   chunk_size: int = 256) -> np.ndarray:
+    """
+    批量模拟组合净值（按日再平衡到目标仓位，与 run_backtest 一致）。
+
+    参数:
+        returns: (T, 5) 各层日收益率
+        qidx: (T,) 每日季度序号，-1 表示信号尚未生效（当日不持仓）
+        weights: (N, Q, 5) 或 (Q, 5) 每个方案在各季度的仓位
+
+    返回:
+        (N, T) 归一化净值（首日 = 1.0）
+    """
+    weights = np.asarray(weights, dtype=float)
+    if weights.ndim == 2:
+        weights = weights[None]
+    returns = np.nan_to_num(np.asarray(returns, dtype=float))
+
+    active = qidx >= 0
+    safe_qidx = np.where(active, qidx, 0)
+    growth = np.empty((len(weights), len(returns)))
+
+    for lo in range(0, len(weights), chunk_size):
+        w = weights[lo:lo + chunk_size]
+        port_ret = np.einsum("ntk,tk->nt", w[:, safe_qidx, :], returns)
+        port_ret[:, ~active] = 0.0
+        port_ret[:, 0] = 0.0
+        growth[lo:lo + chunk_size] = np.cumprod(1 + port_ret, axis=1)
+
+    return growth
+
+
+def batch_stats(nav: np.ndarray, periods_per_year: int = 252, rf: float = 0.045) -> dict:
+    """
+    向量化统计指标（与 compute_stats 口径一致），沿最后一维计算。
+
+    返回: dict，每项为 (N,) 数组
+    """
+    nav = np.atleast_2d(nav)
+    periods = nav.shape[1]
+    years = periods / periods_per_year
+
+    total = nav[:, -1] / nav[:, 0] - 1
+    annual = (1 + total) ** (1 / years) - 1 if years > 0 else np.zeros(len(nav))
+
+    daily = nav[:, 1:] / nav[:, :-1] - 1
+    if daily.shape[1] > 1:
+        vol = daily.std(axis=1, ddof=1) * np.sqrt(periods_per_year)
+    else:
+        vol = np.zeros(len(nav))
+
+    peak = np.maximum.accumulate(nav, axis=1)
+    max_dd = ((nav - peak) / peak).min(axis=1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sharpe = np.where(vol > 0, (annual - rf) / vol, 0.0)
+        calmar = np.where(max_dd < 0, annual / -max_dd, 0.0)
+
+    return {
+        "total_return": total,
+        "annual_return": annual,
+        "volatility": vol,
+        "sharpe": sharpe,
+        "max_drawdown": max_dd,
+        "calmar": calmar,
+    }
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+AIPT 公司级截面指标
+把公司 × 季度面板（CapEx、收入、云收入 / 利润率、数据中心收入、FCF）
+向量化计算为每家公司每季度的 CPI / RDI / MQI，再按可配置权重聚合，
+并给出每家公司对聚合指标的贡献，替代手工汇总进 QuarterData。
+
+面板 CSV（长表）列:
+    company, quarter, capex, revenue, cloud_revenue, cloud_margin, dc_revenue, fcf
+    - quarter 形如 "2025Q1"；金额单位统一即可（增速按同比计算）
+    - 没有对应业务的公司留空（如 NVDA 无云收入、MSFT 无数据中心收入）
+    - 同比增速以 |基期| 为分母（FCF 由负转正记为正增长），并截断在 ±GROWTH_CAP 以内，
+      避免基期接近 0 时单家公司主导聚合指标
+
+用法:
+    python cross_sectional.py --panel company_panel.csv --weighting revenue
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from indicators import compute_cpi, compute_rdi, compute_mqi
+
+FIELDS = ("capex", "revenue", "cloud_revenue", "cloud_margin", "dc_revenue", "fcf")
+WEIGHTINGS = ("equal", "revenue", "capex")
+INDICATOR_NAMES = ("CPI", "RDI", "MQI")
+GROWTH_CAP = 200.0      # 同比增速上下限（%）
+
+
+def load_panel(path: str) -> pd.DataFrame:
+    """读取长表面板 CSV。"""
+    panel = pd.read_csv(path)
+    missing = [c for c in ("company", "quarter") if c not in panel.columns]
+    if missing:
+        raise ValueError(f"面板缺少列: {', '.join(missing)}")
+    return panel
+
+
+def panel_arrays(panel: pd.DataFrame):
+    """
+    长表 → (公司, 季度) 矩阵。
+
+    返回: (companies, quarters, {字段: (C, Q) ndarray})，季度按时间排序并补齐缺口。
+    """
+    periods = pd.PeriodIndex(panel["quarter"].astype(str), freq="Q")
+    full = pd.period_range(periods.min(), periods.max(), freq="Q")
+    frame = panel.assign(quarter=periods).set_index(["company", "quarter"])
+    companies = sorted(frame.index.get_level_values("company").unique())
+
+    arrays = {}
+    for name in FIELDS:
+        if name in frame.columns:
+            wide = frame[name].unstack("quarter").reindex(index=companies, columns=full)
+            arrays[name] = wide.to_numpy(dtype=float)
+        else:
+            arrays[name] = np.full((len(companies), len(full)), np.nan)
+    quarters = [f"{p.year}Q{p.quarter}" for p in full]
+    return companies, quarters, arrays
+
+
+def _yoy(x: np.ndarray, lag: int, cap: float = GROWTH_CAP) -> np.ndarray:
+    """
+    同比增速（%）= (当期 − 基期) / |基期|，前 lag 个季度与基期为 0 时为 NaN。
+    以 |基期| 为分母保证负基期（如 CapEx 周期中的负 FCF）改善时方向为正；
+    结果截断在 ±cap，基期接近 0 时不会爆炸。
+    """
+    out = np.full_like(x, np.nan)
+    base = x[:, :-lag]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out[:, lag:] = (x[:, lag:] - base) / np.abs(base) * 100
+    out[~np.isfinite(out)] = np.nan
+    return np.clip(out, -cap, cap)
+
+
+def compute_company_indicators(panel: pd.DataFrame, lag: int = 4) -> dict:
+    """
+    每家公司每季度的输入增速与 CPI / RDI / MQI，全部为 (C, Q) 数组运算。
+
+    返回: {名称: DataFrame(公司 × 季度)}，包含 CPI / RDI / MQI 及各项增速
+    """
+    companies, quarters, a = panel_arrays(panel)
+
+    capex_growth = _yoy(a["capex"], lag)
+    revenue_growth = _yoy(a["revenue"], lag)
+    cloud_growth = _yoy(a["cloud_revenue"], lag)
+    dc_growth = _yoy(a["dc_revenue"], lag)
+    fcf_growth = _yoy(a["fcf"], lag)
+    margin_change = np.full_like(a["cloud_margin"], np.nan)
+    margin_change[:, lag:] = a["cloud_margin"][:, lag:] - a["cloud_margin"][:, :-lag]
+
+    # 只有一项需求数据的公司（纯云 / 纯数据中心）用该项代替缺失项
+    cloud_filled = np.where(np.isnan(cloud_growth), dc_growth, cloud_growth)
+    dc_filled = np.where(np.isnan(dc_growth), cloud_growth, dc_growth)
+    # 无云业务的公司利润率变化记 0，MQI 只看 FCF
+    margin_filled = np.where(np.isnan(margin_change) & ~np.isnan(fcf_growth), 0.0, margin_change)
+
+    values = {
+        "CPI": compute_cpi(capex_growth, revenue_growth),
+        "RDI": compute_rdi(cloud_filled, dc_filled),
+        "MQI": compute_mqi(margin_filled, fcf_growth),
+        "capex_growth": capex_growth,
+        "revenue_growth": revenue_growth,
+        "cloud_growth": cloud_growth,
+        "dc_growth": dc_growth,
+        "margin_change": margin_change,
+        "fcf_growth": fcf_growth,
+    }
+    return {name: pd.DataFrame(v, index=companies, columns=quarters) for name, v in values.items()}
+
+
+def aggregation_weights(panel: pd.DataFrame, weighting: str = "equal") -> pd.DataFrame:
+    """聚合权重（公司 × 季度，未归一化）：equal / revenue / capex。"""
+    if weighting not in WEIGHTINGS:
+        raise ValueError(f"未知加权方式: {weighting}（可选: {', '.join(WEIGHTINGS)}）")
+    companies, quarters, a = panel_arrays(panel)
+    if weighting == "equal":
+        w = np.ones((len(companies), len(quarters)))
+    else:
+        w = np.clip(np.nan_to_num(a[weighting]), 0, None)
+    return pd.DataFrame(w, index=companies, columns=quarters)
+
+
+def aggregate_indicators(company_indicators: dict, weights: pd.DataFrame):
+    """
+    按权重把公司级 CPI / RDI / MQI 聚合为季度指标，并拆出各公司贡献。
+    每个季度、每个指标只在有数据的公司之间归一化权重。
+
+    返回:
+        aggregate: DataFrame(季度 × CPI/RDI/MQI)
+        contributions: 长表，列 quarter / company / indicator / weight / value / contribution / share
+    """
+    aggregate = {}
+    rows = []
+    for name in INDICATOR_NAMES:
+        x = company_indicators[name].to_numpy()                           # (C, Q)
+        w = np.where(np.isnan(x), 0.0, weights.reindex_like(company_indicators[name]).to_numpy())
+        total = w.sum(axis=0, keepdims=True)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            w_norm = np.where(total > 0, w / total, np.nan)
+        contrib = w_norm * np.nan_to_num(x)
+        agg = np.where(total[0] > 0, contrib.sum(axis=0), np.nan)
+        aggregate[name] = agg
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            share = contrib / agg
+        long = pd.DataFrame({
+            "company": np.repeat(company_indicators[name].index, x.shape[1]),
+            "quarter": np.tile(company_indicators[name].columns, x.shape[0]),
+            "indicator": name,
+            "weight": w_norm.ravel(),
+            "value": x.ravel(),
+            "contribution": contrib.ravel(),
+            "share": share.ravel(),
+        })
+        rows.append(long[~np.isnan(long["value"])])
+
+    quarters = company_indicators[INDICATOR_NAMES[0]].columns
+    aggregate = pd.DataFrame(aggregate, index=quarters)
+    contributions = pd.concat(rows, ignore_index=True)
+    return aggregate, contributions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AIPT 公司级截面指标")
+    parser.add_argument("--panel", type=str, required=True, help="公司 × 季度面板 CSV")
+    parser.add_argument("--weighting", choices=WEIGHTINGS, default="equal")
+    parser.add_argument("--lag", type=int, default=4, help="同比滞后季度数")
+    parser.add_argument("--quarter", type=str, default=None, help="展示该季度的公司贡献（默认最新）")
+    args = parser.parse_args()
+
+    panel = load_panel(args.panel)
+    company_indicators = compute_company_indicators(panel, lag=args.lag)
+    weights = aggregation_weights(panel, args.weighting)
+    aggregate, contributions = aggregate_indicators(company_indicators, weights)
+
+    print(f"📊 聚合指标（{args.weighting} 加权）")
+    print(aggregate.dropna(how="all").round(1).to_string())
+
+    quarter = args.quarter or aggregate.dropna(how="all").index[-1]
+    detail = contributions[contributions["quarter"] == quarter]
+    print(f"\n🏢 {quarter} 各公司贡献")
+    print(detail.pivot(index="company", columns="indicator", values="contribution")
+          .round(2).to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+AIPT 价格数据质量检查与修复
+在 日期 × 标的 收盘价矩阵上一次向量化扫描，检查:
+    - 日历缺口：相邻交易日间隔过长；参考标的（SPY）休市而其他交易所有报价的日期
+    - 停滞报价：连续 N 日价格完全不变
+    - 前值填充：缺失值连续填充的长度
+    - 异常收益：稳健 z 值（中位数 / MAD）与绝对涨跌幅同时超限
+    - 覆盖率：上市后有报价的交易日占比（上市前不算缺失，如 CEG 2022 年才上市）
+
+按修复策略处理后输出：修复后的价格、有效掩码（引擎据此在层内 / 组合基准内重新分配权重）
+与每个标的一行的简要报告。全部为 (T, N) 数组运算，可扩展到数千只标的。
+
+用法:
+    python data_quality.py                     # 读取本地价格库并打印质量报告
+    python data_quality.py --max-ffill 3 --csv backtest_output/data_quality.csv
+"""
+
+import argparse
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from backtest_data import BENCHMARK_TICKER
+
+DEFAULT_REFERENCE = BENCHMARK_TICKER   # 交易日历参考标的
+
+DEFAULT_POLICY = {
+    "max_ffill": 5,             # 缺失最多前值填充的交易日数，超出部分保持缺失
+    "stale_days": 5,            # 连续相同价格达到该天数起视为停滞
+    "outlier_z": 10.0,          # 稳健 z 值阈值
+    "outlier_min_abs": 0.25,    # 同时要求 |日收益| 超过该值才判为异常
+    "outlier_action": "mask",   # mask = 标记无效 / keep = 只报告
+    "stale_action": "mask",     # mask = 标记无效 / keep = 只报告
+    "min_coverage": 0.8,        # 覆盖率低于该值的标的整列剔除
+    "max_gap_days": 4,          # 相邻日期间隔超过该日历天数记为日历缺口
+    "calendar": "reference",    # reference = 剔除参考标的休市日 / union = 保留全部日期
+}
+
+
+def _run_length(flags: np.ndarray) -> np.ndarray:
+    """沿时间轴统计每个位置所在连续 True 段截至当日的长度（向量化，无逐列循环）。"""
+    count = np.cumsum(flags, axis=0)
+    reset = np.where(flags, 0, count)
+    return count - np.maximum.accumulate(reset, axis=0)
+
+
+def _ffill(values: np.ndarray) -> np.ndarray:
+    """按列前值填充 (T, N) 数组。"""
+    present = ~np.isnan(values)
+    idx = np.where(present, np.arange(len(values))[:, None], 0)
+    idx = np.maximum.accumulate(idx, axis=0)
+    return values[idx, np.arange(values.shape[1])]
+
+
+def check_prices(closes: pd.DataFrame, policy: dict = None,
+                 reference: str = DEFAULT_REFERENCE) -> dict:
+    """
+    检查并修复收盘价矩阵（未做前值填充的原始数据）。
+
+    参数:
+        closes: 日期 × 标的 收盘价
+        policy: 覆盖 DEFAULT_POLICY 的部分字段
+        reference: 交易日历参考标的（calendar="reference" 时使用）
+
+    返回:
+        dict 包含:
+        - closes: 修复后的价格（限长前值填充，剔除低覆盖标的与参考标的休市日）
+        - valid: 同形状布尔掩码，True = 当日该标的收益可信（有实际报价、非停滞、非异常）
+        - report: 每个标的一行的质量报告 DataFrame
+        - calendar: 日历检查摘要 dict
+    """
+    policy = {**DEFAULT_POLICY, **(policy or {})}
+    closes = closes.sort_index()
+
+    # ── 日历 ─────────────────────────────────
+    index = closes.index
+    gaps = np.diff(index.values).astype("timedelta64[D]").astype(int) if len(index) > 1 else np.array([], int)
+    gap_starts = index[:-1][gaps > policy["max_gap_days"]]
+    dropped_days = pd.DatetimeIndex([])
+    if policy["calendar"] == "reference" and reference in closes.columns:
+        off = closes[reference].isna().to_numpy() & closes.notna().any(axis=1).to_numpy()
+        # 参考标的上市前的日期不算休市
+        ref_listed = np.maximum.accumulate(closes[reference].notna().to_numpy())
+        off &= ref_listed
+        dropped_days = index[off]
+        closes = closes.loc[~off]
+    elif policy["calendar"] not in ("reference", "union"):
+        raise ValueError(f"未知日历策略: {policy['calendar']}（可选: reference / union）")
+
+    values = closes.to_numpy(dtype=float)                    # (T, N)
+    n_days = len(values)
+    present = ~np.isnan(values)
+    listed = np.maximum.accumulate(present, axis=0)          # 首个报价之后
+    missing = listed & ~present
+
+    # ── 前值填充 ─────────────────────────────
+    streak = _run_length(missing)
+    filled = _ffill(values)
+    fillable = missing & (streak <= policy["max_ffill"])
+    repaired = np.where(present | fillable, filled, np.nan)
+
+    # ── 停滞报价 ─────────────────────────────
+    prev = np.vstack([np.full((1, values.shape[1]), np.nan), filled[:-1]])
+    same = present & (values == prev)
+    stale = _run_length(same) >= policy["stale_days"] - 1
+    stale &= same
+
+    # ── 异常收益（稳健 z 值） ───────────────
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns = np.where(present, values / prev - 1, np.nan)
+    returns[np.isinf(returns)] = np.nan
+    if n_days > 1:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)  # 全缺失列的中位数为 NaN
+            med = np.nanmedian(returns, axis=0)
+            mad = np.nanmedian(np.abs(returns - med), axis=0) * 1.4826
+    else:
+        med = mad = np.full(values.shape[1], np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = np.abs(returns - med) / mad
+    outlier = (np.nan_to_num(z) > policy["outlier_z"]) & \
+              (np.abs(np.nan_to_num(returns)) > policy["outlier_min_abs"])
+
+    # ── 覆盖率与有效掩码 ─────────────────────
+    listed_days = listed.sum(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        coverage = np.where(listed_days > 0, present.sum(axis=0) / listed_days, 0.0)
+    dropped = coverage < policy["min_coverage"]
+
+    valid = present.copy()
+    if policy["stale_action"] == "mask":
+        valid &= ~stale
+    if policy["outlier_action"] == "mask":
+        valid &= ~outlier
+    valid[:, dropped] = False
+    repaired[:, dropped] = np.nan
+
+    first_valid = np.where(present.any(axis=0), present.argmax(axis=0), -1)
+    report = pd.DataFrame({
+        "first_date": [closes.index[i].date() if i >= 0 else None for i in first_valid],
+        "coverage": coverage,
+        "missing_days": missing.sum(axis=0),
+        "max_ffill_streak": streak.max(axis=0) if n_days else 0,
+        "unfilled_days": (missing & ~fillable).sum(axis=0),
+        "stale_days": stale.sum(axis=0),
+        "outliers": outlier.sum(axis=0),
+        "late_listing": first_valid > 0,
+        "dropped": dropped,
+    }, index=closes.columns)
+
+    return {
+        "closes": pd.DataFrame(repaired, index=closes.index, columns=closes.columns),
+        "valid": pd.DataFrame(valid, index=closes.index, columns=closes.columns),
+        "report": report,
+        "calendar": {
+            "days": n_days,
+            "gaps": [d.date() for d in gap_starts],
+            "reference_holidays": [d.date() for d in dropped_days],
+        },
+    }
+
+
+def format_report(quality: dict, limit: int = 20) -> str:
+    """简要质量报告：只列出存在问题的标的。"""
+    report = quality["report"]
+    calendar = quality["calendar"]
+    issues = report[(report["missing_days"] > 0) | (report["stale_days"] > 0) |
+                    (report["outliers"] > 0) | report["late_listing"] | report["dropped"]]
+    lines = [f"🩺 数据质量: {len(report)} 只标的 × {calendar['days']} 个交易日，"
+             f"{len(issues)} 只存在问题"]
+    if calendar["gaps"]:
+        lines.append(f"   ⚠️ 日历缺口 {len(calendar['gaps'])} 处（起始: "
+                     f"{', '.join(map(str, calendar['gaps'][:5]))}{' …' if len(calendar['gaps']) > 5 else ''}）")
+    if calendar["reference_holidays"]:
+        lines.append(f"   ⚠️ 剔除参考标的休市日 {len(calendar['reference_holidays'])} 个")
+    for ticker, row in issues.head(limit).iterrows():
+        notes = []
+        if row["dropped"]:
+            notes.append("已剔除")
+        if row["late_listing"]:
+            notes.append(f"首个报价 {row['first_date']}")
+        if row["missing_days"]:
+            notes.append(f"缺失 {row['missing_days']} 日（最长连续 {row['max_ffill_streak']}，"
+                         f"未填充 {row['unfilled_days']}）")
+        if row["stale_days"]:
+            notes.append(f"停滞 {row['stale_days']} 日")
+        if row["outliers"]:
+            notes.append(f"异常收益 {row['outliers']} 次")
+        lines.append(f"   • {ticker:8s} 覆盖率 {row['coverage']:.1%} | " + "；".join(notes))
+    if len(issues) > limit:
+        lines.append(f"   … 另有 {len(issues) - limit} 只")
+    return "\n".join(lines)
+
+
+def main():
+    from backtest_engine import load_prices
+
+    parser = argparse.ArgumentParser(description="AIPT 价格数据质量检查")
+    parser.add_argument("--max-ffill", type=int, default=DEFAULT_POLICY["max_ffill"],
+                        help="缺失最多前值填充的交易日数")
+    parser.add_argument("--stale-days", type=int, default=DEFAULT_POLICY["stale_days"],
+                        help="连续相同价格达到该天数视为停滞")
+    parser.add_argument("--outlier-z", type=float, default=DEFAULT_POLICY["outlier_z"],
+                        help="异常收益稳健 z 值阈值")
+    parser.add_argument("--min-coverage", type=float, default=DEFAULT_POLICY["min_coverage"],
+                        help="覆盖率低于该值的标的整列剔除")
+    parser.add_argument("--calendar", choices=["reference", "union"],
+                        default=DEFAULT_POLICY["calendar"], help="交易日历策略")
+    parser.add_argument("--csv", type=str, default=None, help="质量报告输出 CSV 路径")
+    args = parser.parse_args()
+
+    policy = {
+        "max_ffill": args.max_ffill,
+        "stale_days": args.stale_days,
+        "outlier_z": args.outlier_z,
+        "min_coverage": args.min_coverage,
+        "calendar": args.calendar,
+    }
+    quality = check_prices(load_prices(), policy)
+    print(format_report(quality, limit=len(quality["report"])))
+    if args.csv:
+        quality["report"].to_csv(args.csv)
+        print(f"\n   质量报告 → {args.csv}")
+
+
+if __name__ == "__main__":
+    main()
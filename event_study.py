@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+AIPT 事件研究
+读取事件日历，对所有事件一次性计算各层、AIPT 组合与基准在 [-pre, +post] 窗口内的
+异常收益（AR）与累计异常收益（CAR），输出 CAR 表与平均事件路径图。
+
+所有事件窗口通过收益矩阵上的一次跨步索引（sliding_window_view）取出，
+数百个事件也只是一次数组运算。
+
+事件日历 CSV 列: date, name[, category]（非交易日自动顺延到下一交易日，# 开头为注释）
+窗口超出数据区间的事件会被剔除：默认 post=10，使 ai_events.csv 中 2026-02-10 的事件
+在数据截至 2026-02-26 时仍可分析（其后只有 11 个交易日）。
+
+异常收益模型:
+    mean    AR = 收益 − 估计窗口 [-pre-est, -pre) 内的日均收益
+    market  AR = 收益 − 基准收益（基准列本身给出原始收益）
+
+用法:
+    python event_study.py --events ai_events.csv --pre 5 --post 10 --model market
+"""
+
+import argparse
+import os
+
+import matplotlib
+matplotlib.use("Agg")  # 无头模式
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from backtest_data import BACKTEST_START, BACKTEST_END
+from backtest_report import BASE_OUTPUT_DIR, COLORS
+
+DEFAULT_EVENTS_PATH = os.path.join(os.path.dirname(__file__), "ai_events.csv")
+MODELS = ("mean", "market")
+DEFAULT_PRE = 5
+DEFAULT_POST = 10
+
+
+def load_events(path: str = DEFAULT_EVENTS_PATH) -> pd.DataFrame:
+    """读取事件日历，按日期排序。"""
+    events = pd.read_csv(path, parse_dates=["date"], comment="#")
+    if "name" not in events.columns:
+        raise ValueError("事件日历缺少 name 列")
+    return events.sort_values("date").reset_index(drop=True)
+
+
+def build_returns_matrix(results: dict) -> pd.DataFrame:
+    """run_backtest 结果 → 日收益矩阵（列: L1-L5 / AIPT / Benchmark）。"""
+    layer_returns = results["layer_returns"]
+    returns = layer_returns.drop(columns="Benchmark").copy()
+    returns["AIPT"] = results["portfolio_nav"].pct_change()
+    returns["Benchmark"] = layer_returns["Benchmark"]
+    return returns.fillna(0.0)
+
+
+def event_study(returns: pd.DataFrame, events: pd.DataFrame, pre: int = DEFAULT_PRE, post: int = DEFAULT_POST,
+                estimation: int = 60, model: str = "mean",
+                benchmark_col: str = "Benchmark") -> dict:
+    """
+    对全部事件向量化计算异常收益。
+
+    参数:
+        returns: (T, K) 日收益矩阵
+        events: load_events 的结果
+        pre / post: 事件窗口前 / 后交易日数
+        estimation: mean 模型的估计窗口长度
+        model: "mean" 或 "market"
+
+    返回:
+        dict 包含:
+        - car: 事件 × 序列 的窗口末端 CAR
+        - car_path: (事件, 序列, 窗口) CAR 数组
+        - average_car: 偏移日 × 序列 的平均 CAR 路径
+        - t_stats: 各序列平均 CAR 的 t 值
+        - events: 实际纳入分析的事件（窗口超出数据范围的被剔除）
+    """
+    if model not in MODELS:
+        raise ValueError(f"未知异常收益模型: {model}（可选: {', '.join(MODELS)}）")
+
+    r = returns.to_numpy(dtype=float)                        # (T, K)
+    n_days, n_series = r.shape
+    width = pre + post + 1
+    offsets = np.arange(-pre, post + 1)
+
+    pos = returns.index.searchsorted(pd.DatetimeIndex(events["date"]), side="left")
+    need_before = pre + (estimation if model == "mean" else 0)
+    valid = (pos - need_before >= 0) & (pos + post < n_days)
+    if not valid.all():
+        dropped = events.loc[~valid, "name"].tolist()
+        print(f"   ⚠️ {len(dropped)} 个事件窗口超出数据范围，已剔除: {', '.join(map(str, dropped))}")
+    events = events.loc[valid].reset_index(drop=True)
+    pos = pos[valid]
+    if len(events) == 0:
+        raise ValueError("没有可分析的事件（检查事件日期与数据区间）")
+
+    # 一次跨步索引取出全部事件窗口: (E, K, W) → (E, W, K)
+    windows = sliding_window_view(r, width, axis=0)[pos - pre].transpose(0, 2, 1)
+
+    if model == "mean":
+        csum = np.vstack([np.zeros((1, n_series)), np.cumsum(r, axis=0)])
+        est_end = pos - pre
+        normal = (csum[est_end] - csum[est_end - estimation]) / estimation    # (E, K)
+        abnormal = windows - normal[:, None, :]
+    else:
+        b = returns.columns.get_loc(benchmark_col)
+        abnormal = windows - windows[:, :, b:b + 1]
+        abnormal[:, :, b] = windows[:, :, b]
+
+    car_path = np.cumsum(abnormal, axis=1)                   # (E, W, K)
+    final = car_path[:, -1, :]
+    mean = final.mean(axis=0)
+    std = final.std(axis=0, ddof=1) if len(final) > 1 else np.full(n_series, np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t_stats = mean / (std / np.sqrt(len(final)))
+
+    index = pd.MultiIndex.from_arrays(
+        [events["date"].dt.date, events["name"]], names=["date", "event"])
+    return {
+        "car": pd.DataFrame(final, index=index, columns=returns.columns),
+        "car_path": car_path.transpose(0, 2, 1),
+        "average_car": pd.DataFrame(car_path.mean(axis=0), index=offsets, columns=returns.columns),
+        "t_stats": pd.Series(t_stats, index=returns.columns),
+        "events": events,
+    }
+
+
+def plot_average_car(study: dict, output_dir: str, pre: int, post: int) -> str:
+    """平均事件 CAR 路径图。"""
+    avg = study["average_car"]
+    fig, ax = plt.subplots(figsize=(12, 6))
+    colors = {**COLORS, "AIPT": COLORS["portfolio"], "Benchmark": COLORS["benchmark"]}
+    for col in avg.columns:
+        bold = col in ("AIPT", "Benchmark")
+        ax.plot(avg.index, avg[col] * 100, label=col, color=colors.get(col),
+                linewidth=2.5 if bold else 1.2, linestyle="--" if col == "Benchmark" else "-")
+    ax.axvline(0, color="#D32F2F", linewidth=1, linestyle=":")
+    ax.axhline(0, color="#999", linewidth=0.8)
+    ax.set_title(f"AIPT Event Study: Average CAR ({len(study['events'])} events, "
+                 f"window [-{pre}, +{post}])", fontsize=14, fontweight="bold", pad=15)
+    ax.set_xlabel("Trading days relative to event", fontsize=11)
+    ax.set_ylabel("Cumulative abnormal return (%)", fontsize=11)
+    ax.legend(loc="upper left", fontsize=9, framealpha=0.9)
+    ax.grid(True, alpha=0.3, linestyle="--")
+
+    fig.tight_layout()
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, "04_event_study.png")
+    fig.savefig(path, dpi=150, bbox_inches="tight")
+    plt.close(fig)
+    return path
+
+
+def main():
+    from backtest_engine import run_backtest
+
+    parser = argparse.ArgumentParser(description="AIPT 事件研究")
+    parser.add_argument("--events", type=str, default=DEFAULT_EVENTS_PATH, help="事件日历 CSV")
+    parser.add_argument("--pre", type=int, default=DEFAULT_PRE, help="事件前窗口（交易日）")
+    parser.add_argument("--post", type=int, default=DEFAULT_POST,
+                        help=f"事件后窗口（交易日，默认 {DEFAULT_POST}；超出数据末尾的事件会被剔除）")
+    parser.add_argument("--estimation", type=int, default=60, help="mean 模型估计窗口（交易日）")
+    parser.add_argument("--model", choices=MODELS, default="market")
+    parser.add_argument("--start", type=str, default=BACKTEST_START)
+    parser.add_argument("--end", type=str, default=BACKTEST_END)
+    args = parser.parse_args()
+
+    results = run_backtest(start_date=args.start, end_date=args.end)
+    study = event_study(build_returns_matrix(results), load_events(args.events),
+                        pre=args.pre, post=args.post, estimation=args.estimation,
+                        model=args.model)
+
+    output_dir = os.path.join(BASE_OUTPUT_DIR, f"{args.start}_{args.end}")
+    os.makedirs(output_dir, exist_ok=True)
+    study["car"].to_csv(os.path.join(output_dir, "event_study_car.csv"))
+
+    print(f"\n📅 事件研究（{args.model} 模型，窗口 [-{args.pre}, +{args.post}]）")
+    print((study["car"] * 100).round(2).to_string())
+    print("\n   平均 CAR (%):")
+    print((study["average_car"].iloc[-1] * 100).round(2).to_string())
+    print("\n   t 值:")
+    print(study["t_stats"].round(2).to_string())
+    print(f"\n   📊 平均事件路径图 → {plot_average_car(study, output_dir, args.pre, args.post)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""
+AIPT 日内回测（分钟线，流式）
+从本地文件分块读取 1 分钟 / 5 分钟等 K 线，逐块计算各层收益、组合与基准净值，
+统计指标用在线算法累积（Welford 均值方差 + 滚动峰值回撤），
+内存只保留当前块、跨块所需的最后一行状态与每日收盘净值，不加载完整 K 线历史。
+
+用于分析调仓日附近的执行质量：调仓计划默认 daily = 每日首根 K 线调仓，
+bar 为每根 K 线调仓，其余同 run_backtest（weekly / monthly / quarterly / signal / 日期文件）。
+
+K 线文件（CSV，可多个，按时间顺序）:
+    宽表  timestamp,MSFT,AMZN,...,SPY    每列一个标的的收盘价
+    长表  timestamp,ticker,close         每行一个标的一根 K 线
+
+用法:
+    python intraday.py --bars "data/bars/*.csv" --freq 5min
+    python intraday.py --bars data/bars_2025.csv --freq 1min --rebalance monthly --start 2025-04-01
+"""
+
+import argparse
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+
+from backtest_data import LAYER_TICKERS, BENCHMARK_TICKER
+from backtest_engine import build_quarterly_signals, compute_layer_returns
+from backtest_report import BASE_OUTPUT_DIR
+from backtest_vectorized import LAYERS, quarter_index, allocation_matrix
+from rebalance import parse_schedule, rebalance_mask, simulate_rebalanced
+
+TRADING_DAYS = 252
+SESSION_MINUTES = 390      # 美股常规交易时段 09:30–16:00
+MARKET_TZ = "America/New_York"
+
+
+def annualization_factor(freq: str = None, index: pd.DatetimeIndex = None,
+                         session_minutes: int = SESSION_MINUTES,
+                         trading_days: int = TRADING_DAYS) -> float:
+    """
+    每年 K 线根数（年化因子）。
+    freq 如 "1min" / "5min" / "1h" / "1D"；未给出时按 index 同一交易日内的时间间隔中位数推断。
+    """
+    if freq is not None:
+        step = pd.Timedelta(freq if freq[:1].isdigit() else f"1{freq}")
+    else:
+        if index is None or len(index) < 2:
+            raise ValueError("无法推断 K 线频率：请提供 freq 或至少两根 K 线")
+        diffs = pd.Series(index[1:] - index[:-1])
+        same_day = index[1:].normalize() == index[:-1].normalize()
+        step = diffs[same_day].median() if same_day.any() else pd.Timedelta(days=1)
+    if step >= pd.Timedelta(days=1):
+        return trading_days / (step / pd.Timedelta(days=1))
+    return trading_days * session_minutes / (step / pd.Timedelta(minutes=1))
+
+
+def iter_bar_chunks(paths, chunksize: int = 200_000, tickers: list = None):
+    """
+    按块读取 K 线文件，每块产出 宽表收盘价 DataFrame（index = 时间戳，列 = 标的）。
+    长表按时间戳透视；块末尾的时间戳可能不完整，留到下一块一起透视。
+    """
+    if isinstance(paths, str):
+        paths = sorted(glob.glob(paths)) or [paths]
+    for path in paths:
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"K 线文件不存在: {path}")
+
+    carry = None
+    for path in paths:
+        for chunk in pd.read_csv(path, chunksize=chunksize):
+            ts_col = chunk.columns[0]
+            chunk[ts_col] = pd.to_datetime(chunk[ts_col])
+            if "ticker" not in chunk.columns:
+                frame = chunk.set_index(ts_col)
+                frame.index.name = None
+                if tickers is not None:
+                    frame = frame[[t for t in tickers if t in frame.columns]]
+                yield frame.astype(float)
+                continue
+
+            if carry is not None:
+                chunk = pd.concat([carry, chunk], ignore_index=True)
+            last_ts = chunk[ts_col].iloc[-1]
+            tail = chunk[ts_col] == last_ts
+            carry = chunk[tail]
+            body = chunk[~tail]
+            if tickers is not None:
+                body = body[body["ticker"].isin(tickers)]
+            if not body.empty:
+                yield _pivot_long(body, ts_col)
+
+    if carry is not None and not carry.empty:
+        if tickers is not None:
+            carry = carry[carry["ticker"].isin(tickers)]
+        yield _pivot_long(carry, carry.columns[0])
+
+
+def _pivot_long(frame: pd.DataFrame, ts_col: str) -> pd.DataFrame:
+    value_col = "close" if "close" in frame.columns else frame.columns[-1]
+    wide = frame.pivot_table(index=ts_col, columns="ticker", values=value_col, aggfunc="last")
+    wide.index.name = None
+    wide.columns.name = None
+    return wide.astype(float)
+
+
+class RunningStats:
+    """
+    净值序列的在线统计：Welford（分块合并）均值 / 方差 + 滚动峰值最大回撤。
+    口径与 compute_stats 一致（收益 = 相邻净值之比，首个净值不产生收益）。
+    """
+
+    def __init__(self):
+        self.points = 0
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.first = None
+        self.last = None
+        self.peak = -np.inf
+        self.max_drawdown = 0.0
+
+    def update(self, nav: np.ndarray):
+        nav = np.asarray(nav, dtype=float)
+        if len(nav) == 0:
+            return
+        if self.first is None:
+            self.first = nav[0]
+            prev = nav[:-1]
+            curr = nav[1:]
+        else:
+            prev = np.r_[self.last, nav[:-1]]
+            curr = nav
+        r = curr / prev - 1
+        if len(r):
+            n_b = len(r)
+            mean_b = r.mean()
+            m2_b = ((r - mean_b) ** 2).sum()
+            n = self.n + n_b
+            delta = mean_b - self.mean
+            self.mean += delta * n_b / n
+            self.m2 += m2_b + delta ** 2 * self.n * n_b / n
+            self.n = n
+
+        peaks = np.maximum.accumulate(np.r_[self.peak, nav])[1:]
+        self.max_drawdown = min(self.max_drawdown, float((nav / peaks - 1).min()))
+        self.peak = peaks[-1]
+        self.points += len(nav)
+        self.last = nav[-1]
+
+    def summary(self, periods_per_year: float, rf: float = 0.045) -> dict:
+        total = self.last / self.first - 1
+        years = self.points / periods_per_year
+        annual = (1 + total) ** (1 / years) - 1 if years > 0 else 0
+        vol = np.sqrt(self.m2 / (self.n - 1)) * np.sqrt(periods_per_year) if self.n > 1 else 0.0
+        return {
+            "final": self.last,
+            "total_return": total,
+            "annual_return": annual,
+            "volatility": vol,
+            "sharpe": (annual - rf) / vol if vol > 0 else 0,
+            "max_drawdown": self.max_drawdown,
+        }
+
+
+class IntradayBacktest:
+    """
+    流式日内回测：feed() 逐块喂入宽表收盘价，result() 汇总。
+    跨块状态只有上一根 K 线的收盘价、目标仓位、收盘持仓与净值。
+    """
+
+    def __init__(self, quarterly_data=None, rebalance="daily", periods_per_year: float = None,
+                 start: str = None, end: str = None, initial_capital: float = 1_000_000):
+        self.quarterly_data = quarterly_data if quarterly_data is not None else build_quarterly_signals()
+        self.weights = allocation_matrix([qd.phase for qd in self.quarterly_data])
+        self.rebalance = rebalance
+        self.schedule = parse_schedule(rebalance) if isinstance(rebalance, str) else rebalance
+        self.periods_per_year = periods_per_year
+        self.start = pd.Timestamp(start) if start else None
+        self.end = pd.Timestamp(end) + pd.Timedelta(days=1) if end else None
+        self.initial_capital = initial_capital
+
+        self._last_close = None    # 上一根 K 线各标的收盘价（跨块计算收益 / 前值填充）
+        self._last_ts = None       # 上一根已模拟的 K 线时间
+        self._target = None        # 上一根 K 线目标仓位
+        self._closing = None       # 上一根 K 线收盘持仓
+        self._nav = 1.0
+        self._bench_nav = 1.0
+        self.portfolio_stats = RunningStats()
+        self.benchmark_stats = RunningStats()
+        self.daily_nav = {}
+        self.rebalances = 0
+        self.turnover = 0.0
+        self.bars = 0
+
+    def feed(self, closes: pd.DataFrame):
+        """处理一块宽表收盘价（须按时间顺序喂入）。"""
+        if closes.index.tz is not None:
+            closes = closes.tz_convert(MARKET_TZ).tz_localize(None)
+        closes = closes.sort_index()
+        if self.start is not None:
+            closes = closes.loc[closes.index >= self.start]
+        if self.end is not None:
+            closes = closes.loc[closes.index < self.end]
+        if closes.empty:
+            return
+        if self.periods_per_year is None:
+            self.periods_per_year = annualization_factor(index=closes.index)
+
+        carried = self._last_close is not None
+        if carried:
+            closes = pd.concat([self._last_close.to_frame().T, closes])
+        closes = closes.ffill()
+        self._last_close = closes.iloc[-1]
+        layer_returns = compute_layer_returns(closes)
+        if carried:
+            layer_returns = layer_returns.iloc[1:]
+
+        qidx = quarter_index(layer_returns.index, self.quarterly_data)
+        keep = qidx >= 0
+        if not keep.any():
+            return
+        dates = layer_returns.index[keep]
+        target = self.weights[qidx[keep]]
+        r = layer_returns.loc[keep, LAYERS].to_numpy()
+        bench = layer_returns.loc[keep, "Benchmark"].fillna(0.0).to_numpy()
+
+        if self._closing is None:
+            # 首次建仓：与 run_backtest 一致，首根 K 线收益不计入
+            mask = rebalance_mask(dates, self.schedule, target)
+            nav, _, closing = simulate_rebalanced(r, target, mask)
+            bench = bench.copy()
+            bench[0] = 0.0
+            self.rebalances += 1
+            prev_closing, new_target = closing[:-1], target[1:]
+        else:
+            # 在块首补一行上一根 K 线：其“目标仓位”= 上一根收盘持仓，收益置 0，
+            # 未到调仓点时新块沿用漂移后的持仓，模拟结果与整段一次性计算相同
+            ext_dates = pd.DatetimeIndex([self._last_ts]).append(dates)
+            mask = rebalance_mask(ext_dates, self.schedule, np.vstack([self._target, target]))
+            nav, _, closing = simulate_rebalanced(
+                np.vstack([np.zeros((1, r.shape[1])), r]),
+                np.vstack([self._closing, target]), mask)
+            prev_closing, new_target = closing[:-1], target
+            nav, closing = nav[1:], closing[1:]
+
+        # 换手 = 调仓 K 线 |目标 − 上一根收盘持仓| / 2（首次建仓不计）
+        rebalanced = mask[1:]
+        self.rebalances += int(rebalanced.sum())
+        self.turnover += float(np.abs(new_target - prev_closing)[rebalanced].sum() / 2)
+
+        port_nav = self._nav * nav
+        bench_nav = self._bench_nav * np.cumprod(1 + bench)
+        self.portfolio_stats.update(port_nav)
+        self.benchmark_stats.update(bench_nav)
+        daily = pd.Series(port_nav, index=dates).groupby(dates.normalize()).last()
+        self.daily_nav.update(daily.to_dict())
+
+        self._nav, self._bench_nav = port_nav[-1], bench_nav[-1]
+        self._closing, self._target, self._last_ts = closing[-1], target[-1], dates[-1]
+        self.bars += len(dates)
+
+    def result(self) -> dict:
+        """
+        汇总统计（字段同 compute_stats）与每日收盘净值。
+        """
+        if self.bars == 0:
+            raise ValueError("没有可回测的 K 线（检查文件、日期范围与季度信号生效日）")
+        cap = self.initial_capital
+        p = self.portfolio_stats.summary(self.periods_per_year)
+        b = self.benchmark_stats.summary(self.periods_per_year)
+        stats = {
+            "portfolio_final": p["final"] * cap,
+            "benchmark_final": b["final"] * cap,
+            "portfolio_total_return": p["total_return"],
+            "benchmark_total_return": b["total_return"],
+            "portfolio_annual_return": p["annual_return"],
+            "benchmark_annual_return": b["annual_return"],
+            "portfolio_volatility": p["volatility"],
+            "benchmark_volatility": b["volatility"],
+            "portfolio_sharpe": p["sharpe"],
+            "benchmark_sharpe": b["sharpe"],
+            "portfolio_max_drawdown": p["max_drawdown"],
+            "benchmark_max_drawdown": b["max_drawdown"],
+            "excess_return": p["total_return"] - b["total_return"],
+            "trading_days": len(self.daily_nav),
+            "bars": self.bars,
+            "periods_per_year": self.periods_per_year,
+            "rebalances": self.rebalances,
+            "turnover": self.turnover,
+        }
+        daily_nav = pd.Series(self.daily_nav).sort_index() * cap
+        return {"stats": stats, "daily_nav": daily_nav}
+
+
+def run_intraday_backtest(paths, freq: str = None, rebalance="daily", chunksize: int = 200_000,
+                          start: str = None, end: str = None, phase_source: str = "labels",
+                          smoothing: str = "none") -> dict:
+    """分块读取 K 线文件并流式回测。"""
+    tickers = sorted({t for ts in LAYER_TICKERS.values() for t in ts} | {BENCHMARK_TICKER})
+    periods = annualization_factor(freq) if freq else None
+    bt = IntradayBacktest(build_quarterly_signals(phase_source, smoothing), rebalance,
+                          periods_per_year=periods, start=start, end=end)
+    for chunk in iter_bar_chunks(paths, chunksize, tickers):
+        bt.feed(chunk)
+    return bt.result()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AIPT 日内 K 线流式回测")
+    parser.add_argument("--bars", type=str, required=True, help="K 线 CSV 文件或通配符")
+    parser.add_argument("--freq", type=str, default=None,
+                        help="K 线频率，如 1min / 5min（默认按时间戳推断）")
+    parser.add_argument("--rebalance", type=str, default="daily",
+                        help="调仓计划: bar / daily / weekly / monthly / quarterly / signal / "
+                             "file:<日期文件> / dates:<日期;...> (默认: daily，每日首根 K 线)")
+    parser.add_argument("--chunksize", type=int, default=200_000, help="每块读取行数")
+    parser.add_argument("--start", type=str, default=None)
+    parser.add_argument("--end", type=str, default=None)
+    parser.add_argument("--phase-source", choices=["labels", "engine"], default="labels")
+    parser.add_argument("--smoothing", type=str, default="none")
+    args = parser.parse_args()
+
+    results = run_intraday_backtest(args.bars, args.freq, args.rebalance, args.chunksize,
+                                    args.start, args.end, args.phase_source, args.smoothing)
+    stats = results["stats"]
+    daily_nav = results["daily_nav"]
+
+    print("=" * 60)
+    print("⏱️ AIPT 日内回测摘要")
+    print("=" * 60)
+    print(f"   区间: {daily_nav.index[0].date()} → {daily_nav.index[-1].date()}")
+    print(f"   K 线: {stats['bars']:,} 根 | 年化因子: {stats['periods_per_year']:,.0f} | "
+          f"调仓: {args.rebalance} ({stats['rebalances']} 次, 换手 {stats['turnover']:.2f})")
+    print(f"   {'':20s} {'AIPT组合':>12s} {'SPY基准':>12s}")
+    print(f"   {'总收益率':20s} {stats['portfolio_total_return']:>11.2%} {stats['benchmark_total_return']:>11.2%}")
+    print(f"   {'年化收益率':20s} {stats['portfolio_annual_return']:>11.2%} {stats['benchmark_annual_return']:>11.2%}")
+    print(f"   {'最大回撤':20s} {stats['portfolio_max_drawdown']:>11.2%} {stats['benchmark_max_drawdown']:>11.2%}")
+    print(f"   {'年化波动率':20s} {stats['portfolio_volatility']:>11.2%} {stats['benchmark_volatility']:>11.2%}")
+    print(f"   {'夏普比率':20s} {stats['portfolio_sharpe']:>11.2f} {stats['benchmark_sharpe']:>11.2f}")
+    print("=" * 60)
+
+    output_dir = os.path.join(BASE_OUTPUT_DIR, f"intraday_{daily_nav.index[0].date()}_{daily_nav.index[-1].date()}")
+    os.makedirs(output_dir, exist_ok=True)
+    daily_nav.rename("nav").to_csv(os.path.join(output_dir, "daily_nav.csv"))
+    pd.Series(stats).to_csv(os.path.join(output_dir, "stats.csv"), header=["value"])
+    print(f"\n   每日净值 / 统计 → {output_dir}/")
+
+
+if __name__ == "__main__":
+    main()
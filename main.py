@@ -1,6 +1,10 @@
 # AI 周期相位雷达系统 - 入口
 # 规则可解释 + 模块化 + 易于替换数据源，便于升级 v2/v3
 
+import hashlib
+import json
+import os
+
 from indicators import (
     compute_cpi,
     compute_rdi,
@@ -8,39 +12,58 @@ from indicators import (
     compute_lpi,
 )
 from phase_classifier import classify_phase
+from phase_engine import PhaseEngine
 from allocation_mapper import allocation_by_phase
 from report import generate_report
 
+# 相位引擎状态持久化文件（输入有变化时在上次相位基础上按转移图推进）；
+# 与 radar_service 的 phase_engine.json 分开，两个入口各自维护一份状态
+PHASE_STATE_PATH = os.path.join(os.path.dirname(__file__), "cache", "phase_engine_main.json")
+
+
+# 此处为手动测试值（后续可替换为 data_fetch + 财报解析）
+DEFAULT_INPUTS = {
+    "capex_growth": 40,
+    "revenue_growth": 20,
+    "cloud_growth": 28,
+    "dc_growth": 35,
+    "margin_change": -2,
+    "fcf_growth": 5,
+    "rate_change": 0.3,
+    "credit_spread_change": 0.1,
+    "pci": 0,
+}
+
+
+def compute_indicators(inputs):
+    """原始输入 → 五维指标 dict（CPI / RDI / MQI / LPI / PCI）。"""
+    return {
+        "CPI": compute_cpi(inputs["capex_growth"], inputs["revenue_growth"]),
+        "RDI": compute_rdi(inputs["cloud_growth"], inputs["dc_growth"]),
+        "MQI": compute_mqi(inputs["margin_change"], inputs["fcf_growth"]),
+        "LPI": compute_lpi(inputs["rate_change"], inputs["credit_spread_change"]),
+        "PCI": inputs["pci"],
+    }
+
+
+def hash_inputs(inputs) -> str:
+    """原始输入的稳定哈希，用于判断是否为新一期数据。"""
+    return hashlib.sha1(json.dumps(inputs, sort_keys=True).encode("utf-8")).hexdigest()
+
 
 def main():
-    # 此处为手动测试值（后续可替换为 data_fetch + 财报解析）
-    capex_growth = 40
-    revenue_growth = 20
-    cloud_growth = 28
-    dc_growth = 35
-    margin_change = -2
-    fcf_growth = 5
-    rate_change = 0.3
-    credit_spread_change = 0.1
-    pci_value = 0
-
-    cpi = compute_cpi(capex_growth, revenue_growth)
-    rdi = compute_rdi(cloud_growth, dc_growth)
-    mqi = compute_mqi(margin_change, fcf_growth)
-    lpi = compute_lpi(rate_change, credit_spread_change)
+    indicators = compute_indicators(DEFAULT_INPUTS)
+    cpi, rdi, mqi, lpi, pci_value = (indicators[k] for k in ("CPI", "RDI", "MQI", "LPI", "PCI"))
 
     phase = classify_phase(cpi, rdi, mqi, lpi, pci_value)
     allocations = allocation_by_phase(phase)
 
-    indicators = {
-        "CPI": cpi,
-        "RDI": rdi,
-        "MQI": mqi,
-        "LPI": lpi,
-        "PCI": pci_value,
-    }
+    # 同一份输入重复运行（如定时任务）不计入确认窗口
+    engine = PhaseEngine.load(PHASE_STATE_PATH)
+    if engine.observe(cpi, rdi, mqi, lpi, hash_inputs(DEFAULT_INPUTS)):
+        engine.save(PHASE_STATE_PATH)
 
-    generate_report(phase, allocations, indicators)
+    generate_report(phase, allocations, indicators, state_phase=engine.label)
 
 
 if __name__ == "__main__":
@@ -1,21 +1,41 @@
 # 相位分类：根据五维指标判断当前周期阶段
 
+# 默认阈值（手工设定，可由 phase_optimizer 搜索替换）
+DEFAULT_THRESHOLDS = {
+    "p1_cpi_min": 20,    # Phase 1: CPI >
+    "p1_rdi_min": 30,    # Phase 1: RDI >
+    "p1_mqi_min": 0,     # Phase 1: MQI >=
+    "p1_pci_max": 50,    # Phase 1: PCI <
+    "p2_cpi_min": 20,    # Phase 2: CPI >
+    "p2_rdi_max": 30,    # Phase 2: RDI <
+    "p3_cpi_low": 0,     # Phase 3: CPI 区间下限
+    "p3_cpi_high": 10,   # Phase 3: CPI 区间上限
+    "p3_mqi_min": 0,     # Phase 3: MQI >
+    "p4_cpi_max": 0,     # Phase 4: CPI <
+    "p4_rdi_max": 20,    # Phase 4: RDI <
+    "p4_lpi_min": 0,     # Phase 4: LPI >
+}
 
-def classify_phase(cpi, rdi, mqi, lpi, pci):
+
+def classify_phase(cpi, rdi, mqi, lpi, pci, thresholds=None):
     """
     根据 CPI, RDI, MQI, LPI, PCI 判断当前处于哪个相位。
+    thresholds: 覆盖 DEFAULT_THRESHOLDS 中的部分或全部阈值。
     返回: "Phase 1 - Expansion" | "Phase 2 - Efficiency Divergence" | ...
     """
-    if cpi > 20 and rdi > 30 and mqi >= 0 and pci < 50:
+    t = DEFAULT_THRESHOLDS if thresholds is None else {**DEFAULT_THRESHOLDS, **thresholds}
+
+    if cpi > t["p1_cpi_min"] and rdi > t["p1_rdi_min"] and mqi >= t["p1_mqi_min"] \
+            and pci < t["p1_pci_max"]:
         return "Phase 1 - Expansion"
 
-    if cpi > 20 and rdi < 30:
+    if cpi > t["p2_cpi_min"] and rdi < t["p2_rdi_max"]:
         return "Phase 2 - Efficiency Divergence"
 
-    if 0 <= cpi <= 10 and mqi > 0:
+    if t["p3_cpi_low"] <= cpi <= t["p3_cpi_high"] and mqi > t["p3_mqi_min"]:
         return "Phase 3 - Monetization"
 
-    if cpi < 0 and rdi < 20 and lpi > 0:
+    if cpi < t["p4_cpi_max"] and rdi < t["p4_rdi_max"] and lpi > t["p4_lpi_min"]:
         return "Phase 4 - Contraction"
 
     return "Transitional"
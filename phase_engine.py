@@ -0,0 +1,227 @@
+"""
+AIPT 有状态相位引擎
+按 README 相位转移图维护当前相位，而不是每次独立判定：
+
+    Phase1 → Phase2 : RDI 回落 + MQI 转负
+    Phase2 → Phase3 : CPI 下降 + MQI 回升
+    Phase2 → Phase4 : RDI 崩塌 + LPI 飙升
+    Phase3 → Phase1 : CPI 重新上升 + RDI 回暖
+    Phase3 → Phase4 : MQI 再次恶化 + LPI 上升
+    Phase4 → Phase1 : CPI 转正 + RDI>30 + LPI 下降
+
+- 滞回带：阈值与趋势判断都要越过一个缓冲幅度才算成立，避免在阈值附近来回切换；
+- 确认窗口：转移条件需连续成立 confirm 次才执行，期间标记为过渡期（如 "Phase 1→2"）；
+- update() 单步 O(1)，可持久化到 JSON 驱动实时雷达；
+- replay() 对整段历史先向量化计算全部条件，再跳跃式扫描，20 年日度数据毫秒级完成。
+"""
+
+import json
+import os
+from dataclasses import dataclass, field, asdict
+
+import numpy as np
+import pandas as pd
+
+INDICATORS = ("cpi", "rdi", "mqi", "lpi")
+START_PHASE = 1
+
+# 滞回带（各指标量纲不同，分别设定）
+DEFAULT_HYSTERESIS = {"cpi": 2.0, "rdi": 2.0, "mqi": 1.0, "lpi": 0.1}
+
+# 转移规则参数
+DEFAULT_RULE_PARAMS = {
+    "rdi_collapse": 20,     # Phase2→4: RDI 低于此值视为崩塌
+    "lpi_spike": 0.3,       # Phase2→4: LPI 高于此值视为飙升
+    "rdi_recovery": 30,     # Phase4→1: RDI 需高于此值
+}
+
+# (源相位, 目标相位)；顺序即同时成立时的优先级（先判定风险方向）
+TRANSITIONS = [(1, 2), (2, 4), (2, 3), (3, 4), (3, 1), (4, 1)]
+
+
+def _conditions(level: dict, trend: dict, h: dict, p: dict) -> list:
+    """
+    按 TRANSITIONS 顺序返回各转移条件。
+    level 为指标当前值，trend 为最近一次变化量；标量与数组通用。
+    """
+    def rising(k):
+        return trend[k] > h[k]
+
+    def falling(k):
+        return trend[k] < -h[k]
+
+    return [
+        falling("rdi") & (level["mqi"] < -h["mqi"]),                                   # 1→2
+        (level["rdi"] < p["rdi_collapse"] - h["rdi"]) & (level["lpi"] > p["lpi_spike"] + h["lpi"]),  # 2→4
+        falling("cpi") & rising("mqi"),                                                 # 2→3
+        falling("mqi") & rising("lpi"),                                                 # 3→4
+        rising("cpi") & rising("rdi"),                                                  # 3→1
+        (level["cpi"] > h["cpi"]) & (level["rdi"] > p["rdi_recovery"] + h["rdi"])
+        & falling("lpi"),                                                               # 4→1
+    ]
+
+
+def phase_label(phase: int, pending: int = None) -> str:
+    """相位编号 → 标签，如 "Phase 2" / 过渡期 "Phase 1→2"。"""
+    if pending:
+        return f"Phase {phase}→{pending}"
+    return f"Phase {phase}"
+
+
+@dataclass
+class PhaseEngine:
+    """
+    有状态相位引擎。
+
+    参数:
+        confirm: 转移条件需连续成立的次数（确认窗口）
+        hysteresis: 各指标滞回带
+        rule_params: 转移规则阈值
+    """
+    confirm: int = 2
+    hysteresis: dict = field(default_factory=lambda: dict(DEFAULT_HYSTERESIS))
+    rule_params: dict = field(default_factory=lambda: dict(DEFAULT_RULE_PARAMS))
+    # 运行状态
+    phase: int = START_PHASE
+    pending: int = None
+    last: dict = None                    # 上一次指标值
+    trend: dict = None                   # 各指标最近一次非零变化量
+    runs: list = field(default_factory=lambda: [0] * len(TRANSITIONS))
+    updated_at: str = None
+    inputs_hash: str = None              # 最近一次已应用输入的哈希（随状态持久化）
+
+    @property
+    def label(self) -> str:
+        return phase_label(self.phase, self.pending)
+
+    def update(self, cpi, rdi, mqi, lpi, date=None) -> str:
+        """输入一期指标，返回更新后的相位标签。"""
+        level = {"cpi": cpi, "rdi": rdi, "mqi": mqi, "lpi": lpi}
+        if self.trend is None:
+            self.trend = {k: 0.0 for k in INDICATORS}
+        if self.last is not None:
+            for k in INDICATORS:
+                delta = level[k] - self.last[k]
+                if delta != 0:
+                    self.trend[k] = delta
+        self.last = level
+
+        conds = _conditions(level, self.trend, self.hysteresis, self.rule_params)
+        self.runs = [r + 1 if c else 0 for r, c in zip(self.runs, conds)]
+
+        self.pending = None
+        for (src, dst), run in zip(TRANSITIONS, self.runs):
+            if src != self.phase or run == 0:
+                continue
+            if run >= self.confirm:
+                self.phase = dst
+                self.pending = None
+                break
+            if self.pending is None:
+                self.pending = dst
+
+        if date is not None:
+            self.updated_at = str(pd.Timestamp(date).date())
+        return self.label
+
+    def observe(self, cpi, rdi, mqi, lpi, inputs_hash: str, date=None) -> bool:
+        """
+        仅当输入与上次已应用的不同时才推进一期，返回是否推进。
+        常驻服务重启、定时任务重复运行时，相同数据不会被重复计入确认窗口。
+        """
+        if inputs_hash == self.inputs_hash:
+            return False
+        self.update(cpi, rdi, mqi, lpi, date=date)
+        self.inputs_hash = inputs_hash
+        return True
+
+    def replay(self, indicators: pd.DataFrame) -> pd.DataFrame:
+        """
+        回放整段历史（列: cpi/rdi/mqi/lpi，按日期排序），从当前状态继续推进。
+
+        返回: DataFrame，列 phase（相位编号）/ pending（待确认目标，0 表示无）/ label
+        """
+        values = {k: indicators[k].to_numpy(dtype=float) for k in INDICATORS}
+        n = len(indicators)
+        if n == 0:
+            return pd.DataFrame(columns=["phase", "pending", "label"])
+
+        # 趋势 = 最近一次非零变化量（对季度数据前向填充成日度时同样适用）
+        trend = {}
+        for k in INDICATORS:
+            prev = self.last[k] if self.last is not None else values[k][0]
+            delta = np.diff(values[k], prepend=prev)
+            delta[delta == 0] = np.nan
+            seed = self.trend[k] if self.trend is not None else 0.0
+            trend[k] = pd.Series(delta).ffill().fillna(seed).to_numpy()
+
+        conds = np.array(_conditions(values, trend, self.hysteresis, self.rule_params), dtype=bool)
+
+        # 连续成立次数（承接当前状态中的计数）
+        runs = np.empty(conds.shape, dtype=int)
+        for r in range(len(TRANSITIONS)):
+            c = conds[r]
+            breaks = np.where(~c, np.arange(n), -1)
+            last_break = np.maximum.accumulate(breaks)
+            run = np.arange(n) - last_break
+            run[last_break < 0] += self.runs[r]     # 序列开头的连续段接上历史计数
+            runs[r] = np.where(c, run, 0)
+        confirmed = runs >= self.confirm
+
+        # 每条规则下一个「确认成立」的位置，供跳跃扫描
+        next_hit = np.full((len(TRANSITIONS), n + 1), n)
+        for r in range(len(TRANSITIONS)):
+            pos = np.where(confirmed[r], np.arange(n), n)
+            next_hit[r, :n] = np.minimum.accumulate(pos[::-1])[::-1]
+
+        phases = np.empty(n, dtype=int)
+        t, phase = 0, self.phase
+        while t < n:
+            rules = [r for r, (src, _) in enumerate(TRANSITIONS) if src == phase]
+            hits = [(next_hit[r, t], r) for r in rules]
+            t_next, r_next = min(hits) if hits else (n, None)
+            phases[t:t_next] = phase
+            if t_next >= n:
+                break
+            phase = TRANSITIONS[r_next][1]
+            phases[t_next] = phase
+            t = t_next + 1
+
+        # 过渡期标记：当日相位的出向转移条件已成立但尚未确认
+        pending = np.zeros(n, dtype=int)
+        before = np.concatenate(([self.phase], phases[:-1]))
+        for r in reversed(range(len(TRANSITIONS))):
+            src, dst = TRANSITIONS[r]
+            active = (phases == src) & (before == src) & conds[r] & ~confirmed[r]
+            pending[active] = dst
+
+        # 同步内部状态，使 replay 之后可继续 update
+        self.phase = int(phases[-1])
+        self.pending = int(pending[-1]) or None
+        self.last = {k: float(values[k][-1]) for k in INDICATORS}
+        self.trend = {k: float(trend[k][-1]) for k in INDICATORS}
+        self.runs = [int(x) for x in runs[:, -1]]
+        if isinstance(indicators.index, pd.DatetimeIndex):
+            self.updated_at = str(indicators.index[-1].date())
+
+        labels = [phase_label(ph, pe) for ph, pe in zip(phases, pending)]
+        return pd.DataFrame({"phase": phases, "pending": pending, "label": labels},
+                            index=indicators.index)
+
+    # ── 持久化 ─────────────────────────────
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(asdict(self), f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str, **defaults) -> "PhaseEngine":
+        """读取持久化状态；文件不存在时返回初始状态的新引擎。"""
+        if not os.path.exists(path):
+            return cls(**defaults)
+        with open(path, encoding="utf-8") as f:
+            return cls(**json.load(f))
+
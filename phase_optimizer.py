@@ -0,0 +1,465 @@
+#!/usr/bin/env python3
+"""
+AIPT 相位阈值 / 仓位优化器
+在 classify_phase 阈值与各相位仓位倾斜上做搜索（网格 / 随机 / 坐标下降），
+目标函数可选 Sharpe 或 Calmar，支持滚动前推（walk-forward）训练 / 测试切分。
+
+- 价格走 load_prices 本地缓存并经 prepare_returns 质量检查 / 掩码，各层收益只计算一次；
+- 评估使用 backtest_vectorized 批量计算，多进程并行；
+- phases="labels"（默认参数）沿用 QUARTERLY_DATA 手工相位（含 Phase 1→2），与 run_backtest 一致；
+  phases="classifier" 按参数中的阈值重新判定相位；
+- 阈值只通过「季度相位序列」影响结果，相位序列相同的参数组合视为等价区域，只评估一次；
+- 每次试验结果追加写入 JSONL（键含收益矩阵与季度数据 / 仓位表哈希），中断后重新运行会跳过已完成试验；
+- 最优参数写入 best_params.json，可用 run_backtest.py --params 回测。
+
+用法:
+    python phase_optimizer.py --method random --trials 2000 --objective sharpe
+    python phase_optimizer.py --method coordinate --folds 3 --workers 8
+    python run_backtest.py --params optimizer_output/best_params.json
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import replace
+
+import numpy as np
+import pandas as pd
+
+from backtest_data import (
+    QUARTERLY_DATA, PHASE_ALLOCATIONS, BACKTEST_START, BACKTEST_END, get_phase_allocation,
+)
+from backtest_engine import prepare_returns, simulate_strategy
+from backtest_vectorized import LAYERS, quarter_index, simulate_batch, batch_stats
+from phase_classifier import DEFAULT_THRESHOLDS, classify_phase
+from result_cache import stable_hash
+
+DEFAULT_OUTPUT_DIR = os.path.join(os.path.dirname(__file__), "optimizer_output")
+DEFAULT_RESULTS_PATH = os.path.join(DEFAULT_OUTPUT_DIR, "trials.jsonl")
+DEFAULT_BEST_PATH = os.path.join(DEFAULT_OUTPUT_DIR, "best_params.json")
+
+# classify_phase 输出 → 仓位表键
+PHASE_KEYS = {
+    "Phase 1 - Expansion": "Phase 1",
+    "Phase 2 - Efficiency Divergence": "Phase 2",
+    "Phase 3 - Monetization": "Phase 3",
+    "Phase 4 - Contraction": "Phase 4",
+}
+
+# 仓位倾斜参数：正值表示从 L5 挪到 L2（对应 README 3.2 的 L2/L5 联动规则）
+TILT_PARAMS = {**{f"tilt_p{i}": f"Phase {i}" for i in range(1, 5)}, "tilt_p12": "Phase 1→2"}
+
+SEARCH_SPACE = {
+    "phases": ["labels", "classifier"],   # labels = QUARTERLY_DATA 手工相位，此时阈值不起作用
+    "p1_cpi_min": [0, 5, 10, 20, 30],
+    "p1_rdi_min": [20, 30, 40, 60],
+    "p1_mqi_min": [-10, 0, 10],
+    "p1_pci_max": [50, 100],          # 100 = 不要求价格确认
+    "p2_cpi_min": [10, 20, 40, 60],
+    "p2_rdi_max": [30, 45, 60, 80],
+    "p3_cpi_high": [10, 20],
+    "p3_mqi_min": [-5, 0, 5],
+    "p4_rdi_max": [20, 30],
+    "p4_lpi_min": [-0.5, 0, 0.5],
+    **{name: [-0.10, -0.05, 0.0, 0.05, 0.10] for name in TILT_PARAMS},
+}
+
+OBJECTIVES = ("sharpe", "calmar", "annual_return", "total_return")
+
+
+# ── 参数 → 相位 / 仓位 ────────────────────────────────────────────────────
+
+def default_params() -> dict:
+    """
+    run_backtest 实际交易的策略：手工相位 + 原始仓位表（不倾斜）。
+    阈值取 DEFAULT_THRESHOLDS，供切换到 classifier 时作为坐标下降的起点。
+    """
+    params = {"phases": "labels"}
+    params.update({k: DEFAULT_THRESHOLDS[k] for k in SEARCH_SPACE if k in DEFAULT_THRESHOLDS})
+    params.update({name: 0.0 for name in TILT_PARAMS})
+    return params
+
+
+def params_to_phases(params: dict, quarterly_data=None) -> tuple:
+    """
+    参数 → 季度相位序列。
+    phases="labels" 直接取季度数据的相位；否则（默认 classifier）按参数中的阈值逐季度判定，
+    Transitional 沿用上一季度相位。
+    """
+    if quarterly_data is None:
+        quarterly_data = QUARTERLY_DATA
+    if params.get("phases", "classifier") == "labels":
+        return tuple(qd.phase for qd in quarterly_data)
+    thresholds = {k: v for k, v in params.items() if k in DEFAULT_THRESHOLDS}
+    phases = []
+    current = None
+    for qd in quarterly_data:
+        label = classify_phase(qd.cpi, qd.rdi, qd.mqi, qd.lpi, qd.pci, thresholds)
+        current = PHASE_KEYS.get(label, current)
+        phases.append(current)
+    return tuple(phases)
+
+
+def tilted_allocations(params: dict) -> dict:
+    """在 PHASE_ALLOCATIONS 基础上应用 L2/L5 倾斜（不允许出现负仓位）。"""
+    allocations = {phase: dict(alloc) for phase, alloc in PHASE_ALLOCATIONS.items()}
+    for name, phase in TILT_PARAMS.items():
+        alloc = allocations[phase]
+        tilt = float(np.clip(params.get(name, 0.0), -alloc["L2"], alloc["L5"]))
+        alloc["L2"] += tilt
+        alloc["L5"] -= tilt
+    return allocations
+
+
+def params_signature(params: dict, quarterly_data=None) -> tuple:
+    """
+    等价区域签名：相位序列 + 实际用到的相位的倾斜。
+    签名相同的参数组合回测结果完全一致，只需评估一次。
+    """
+    phases = params_to_phases(params, quarterly_data)
+    used = sorted({p for p in phases if p is not None})
+    tilts = tuple(params.get(name, 0.0) for name, phase in TILT_PARAMS.items() if phase in used)
+    return phases + tilts
+
+
+def params_to_weights(params: dict, quarterly_data=None) -> np.ndarray:
+    """参数 → (Q, 5) 季度仓位矩阵。"""
+    allocations = tilted_allocations(params)
+    phases = params_to_phases(params, quarterly_data)
+    return np.array([
+        [get_phase_allocation(phase, allocations)[layer] for layer in LAYERS] for phase in phases
+    ], dtype=float)
+
+
+def params_to_quarterly(params: dict, quarterly_data=None) -> tuple:
+    """
+    参数 → (季度数据, 仓位表)，供 run_backtest 直接回测优化结果。
+    相位与原标注不同的季度替换 phase / phase_label。
+    """
+    if quarterly_data is None:
+        quarterly_data = QUARTERLY_DATA
+    phases = params_to_phases(params, quarterly_data)
+    signals = [
+        qd if phase == qd.phase else replace(qd, phase=phase, phase_label=f"⚙️ {phase}（优化参数）")
+        for qd, phase in zip(quarterly_data, phases)
+    ]
+    return signals, tilted_allocations(params)
+
+
+def data_signature(layer_returns: pd.DataFrame) -> str:
+    """收益矩阵 + 季度数据 + 仓位表的哈希：任一变化都会使已记录的试验失效。"""
+    return stable_hash({
+        "returns": layer_returns[LAYERS],
+        "quarterly_data": QUARTERLY_DATA,
+        "allocations": PHASE_ALLOCATIONS,
+    })
+
+
+def check_baseline(layer_returns: pd.DataFrame, atol: float = 1e-9):
+    """校验默认参数的批量模拟净值与 run_backtest（simulate_strategy）完全一致。"""
+    qidx = quarter_index(layer_returns.index)
+    nav = simulate_batch(layer_returns[LAYERS].to_numpy(dtype=float), qidx,
+                         params_to_weights(default_params()))[0]
+    reference = simulate_strategy(layer_returns, QUARTERLY_DATA)["nav"].to_numpy()
+    # 只比较信号生效后的逐日增长（两者对信号生效首日收益的处理不同）
+    nav = nav[qidx >= 0]
+    if len(nav) != len(reference) or \
+            not np.allclose(nav[1:] / nav[:-1], reference[1:] / reference[:-1], atol=atol):
+        raise AssertionError("默认参数净值与 run_backtest 不一致，请检查相位 / 仓位映射")
+
+
+# ── 多进程评估 ─────────────────────────────────────────────────────────────
+
+_WORKER_DATA = {}
+
+
+def _init_worker(returns: np.ndarray, qidx: np.ndarray):
+    """每个工作进程只接收一次收益矩阵。"""
+    _WORKER_DATA["returns"] = returns
+    _WORKER_DATA["qidx"] = qidx
+
+
+def _evaluate_chunk(weights: np.ndarray, lo: int, hi: int) -> list:
+    nav = simulate_batch(_WORKER_DATA["returns"][lo:hi], _WORKER_DATA["qidx"][lo:hi], weights)
+    stats = batch_stats(nav)
+    return [{k: float(v[i]) for k, v in stats.items()} for i in range(len(weights))]
+
+
+# ── 试验持久化 ─────────────────────────────────────────────────────────────
+
+class TrialStore:
+    """JSONL 试验记录：trial_id → {params, metrics}，支持断点续跑。"""
+
+    def __init__(self, path: str = DEFAULT_RESULTS_PATH):
+        self.path = path
+        self.records = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        rec = json.loads(line)
+                        self.records[rec["trial_id"]] = rec
+
+    @staticmethod
+    def trial_id(params: dict, window: tuple, data_hash: str = "") -> str:
+        payload = json.dumps({"params": params, "window": list(window), "data": data_hash},
+                             sort_keys=True)
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+    def add(self, records: list):
+        if not records:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            for rec in records:
+                f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+                self.records[rec["trial_id"]] = rec
+
+
+# ── 优化器 ────────────────────────────────────────────────────────────────
+
+class PhaseOptimizer:
+    """
+    相位阈值 / 仓位搜索器。
+
+    参数:
+        layer_returns: prepare_returns 的各层收益（已截取回测区间）
+        objective: 目标函数，见 OBJECTIVES
+        workers: 并行进程数（<=1 时在本进程内计算）
+        store: TrialStore，记录全部试验用于续跑
+    """
+
+    def __init__(self, layer_returns: pd.DataFrame, objective: str = "sharpe",
+                 workers: int = None, store: TrialStore = None, chunk_size: int = 256):
+        if objective not in OBJECTIVES:
+            raise ValueError(f"未知目标函数: {objective}（可选: {', '.join(OBJECTIVES)}）")
+        self.dates = layer_returns.index
+        self.returns = layer_returns[LAYERS].to_numpy(dtype=float)
+        self.data_hash = data_signature(layer_returns)
+        self.qidx = quarter_index(self.dates)
+        self.objective = objective
+        self.workers = workers if workers is not None else os.cpu_count()
+        self.store = store if store is not None else TrialStore()
+        self.chunk_size = chunk_size
+        self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def _window(self, day_slice: slice) -> tuple:
+        dates = self.dates[day_slice]
+        return str(dates[0].date()), str(dates[-1].date())
+
+    def evaluate(self, params_list: list, day_slice: slice = slice(None)) -> list:
+        """
+        评估一批参数，返回与输入等长的 metrics 列表。
+        已记录的试验直接读取；等价签名只计算一次；每个分块完成即追加写入 JSONL，
+        中断后重跑只需计算尚未落盘的分块。
+        """
+        window = self._window(day_slice)
+        lo, hi, _ = day_slice.indices(len(self.dates))
+
+        trial_ids = [TrialStore.trial_id(p, window, self.data_hash) for p in params_list]
+        results = [None] * len(params_list)
+        pending = {}   # signature → [下标]
+        for i, (params, tid) in enumerate(zip(params_list, trial_ids)):
+            if tid in self.store.records:
+                results[i] = self.store.records[tid]["metrics"]
+            else:
+                pending.setdefault(params_signature(params), []).append(i)
+
+        if pending:
+            groups = list(pending.values())
+            weights = np.stack([params_to_weights(params_list[g[0]]) for g in groups])
+            for offset, metrics in self._run(weights, lo, hi):
+                new_records = []
+                for group, m in zip(groups[offset:offset + len(metrics)], metrics):
+                    for i in group:
+                        results[i] = m
+                        new_records.append({
+                            "trial_id": trial_ids[i], "window": list(window),
+                            "params": params_list[i], "metrics": m,
+                        })
+                self.store.add(new_records)
+
+        return results
+
+    def _run(self, weights: np.ndarray, lo: int, hi: int):
+        """按分块计算，逐块产出 (分块起始下标, metrics 列表)；多进程时按完成顺序产出。"""
+        offsets = range(0, len(weights), self.chunk_size)
+        if self.workers <= 1 or len(offsets) == 1:
+            _init_worker(self.returns, self.qidx)
+            for i in offsets:
+                yield i, _evaluate_chunk(weights[i:i + self.chunk_size], lo, hi)
+            return
+
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                             initargs=(self.returns, self.qidx))
+        futures = {self._pool.submit(_evaluate_chunk, weights[i:i + self.chunk_size], lo, hi): i
+                   for i in offsets}
+        try:
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def _best(self, params_list: list, metrics: list) -> tuple:
+        scores = [m[self.objective] for m in metrics]
+        i = int(np.nanargmax(scores))
+        return params_list[i], metrics[i]
+
+    # ── 搜索策略 ─────────────────────────────
+
+    def grid_search(self, day_slice: slice = slice(None)) -> tuple:
+        """
+        全网格搜索。先枚举阈值网格并按相位序列去重（剪掉等价区域），
+        再仅对出现过的相位展开仓位倾斜网格。
+        """
+        threshold_keys = [k for k in SEARCH_SPACE if k not in TILT_PARAMS]
+        unique = {}
+        for values in itertools.product(*(SEARCH_SPACE[k] for k in threshold_keys)):
+            params = dict(zip(threshold_keys, values))
+            unique.setdefault(params_to_phases(params), params)
+        print(f"   阈值网格去重后剩余 {len(unique)} 种相位序列")
+
+        candidates = []
+        for phases, params in unique.items():
+            used = {p for p in phases if p is not None}
+            tilt_keys = [k for k, phase in TILT_PARAMS.items() if phase in used]
+            for values in itertools.product(*(SEARCH_SPACE[k] for k in tilt_keys)):
+                candidate = {**params, **{k: 0.0 for k in TILT_PARAMS}, **dict(zip(tilt_keys, values))}
+                candidates.append(candidate)
+        print(f"   共 {len(candidates)} 组候选参数")
+
+        return self._best(candidates, self.evaluate(candidates, day_slice))
+
+    def random_search(self, n_trials: int = 1000, day_slice: slice = slice(None),
+                      seed: int = 0) -> tuple:
+        """随机搜索：从 SEARCH_SPACE 中均匀采样 n_trials 组参数。"""
+        rng = random.Random(seed)
+        candidates = [default_params()] + [
+            {k: rng.choice(v) for k, v in SEARCH_SPACE.items()} for _ in range(n_trials - 1)
+        ]
+        return self._best(candidates, self.evaluate(candidates, day_slice))
+
+    def coordinate_search(self, max_rounds: int = 5, day_slice: slice = slice(None)) -> tuple:
+        """
+        坐标下降：从默认参数出发，每次只改变一个参数取其最优值，直到一轮内无改进。
+        与当前解签名相同的候选值直接剪枝。
+        """
+        best = default_params()
+        best_metrics = self.evaluate([best], day_slice)[0]
+        for round_no in range(1, max_rounds + 1):
+            improved = False
+            for key, values in SEARCH_SPACE.items():
+                current_sig = params_signature(best)
+                candidates = [{**best, key: v} for v in values if v != best[key]]
+                candidates = [c for c in candidates if params_signature(c) != current_sig]
+                if not candidates:
+                    continue
+                params, metrics = self._best(candidates, self.evaluate(candidates, day_slice))
+                if metrics[self.objective] > best_metrics[self.objective] + 1e-12:
+                    best, best_metrics = params, metrics
+                    improved = True
+            print(f"   第 {round_no} 轮: {self.objective}={best_metrics[self.objective]:.4f}")
+            if not improved:
+                break
+        return best, best_metrics
+
+    def search(self, method: str, day_slice: slice = slice(None), **kwargs) -> tuple:
+        if method == "grid":
+            return self.grid_search(day_slice)
+        if method == "random":
+            return self.random_search(day_slice=day_slice, **kwargs)
+        if method == "coordinate":
+            return self.coordinate_search(day_slice=day_slice, **kwargs)
+        raise ValueError(f"未知搜索方法: {method}（可选: grid / random / coordinate）")
+
+    # ── Walk-forward ─────────────────────────
+
+    def walk_forward(self, method: str, n_folds: int = 3, **kwargs) -> pd.DataFrame:
+        """
+        扩展窗口前推验证：交易日等分为 n_folds+1 段，
+        第 k 折在前 k 段上搜索，在第 k+1 段上做样本外评估。
+        """
+        bounds = np.linspace(0, len(self.dates), n_folds + 2).astype(int)
+        rows = []
+        for k in range(1, n_folds + 1):
+            train, test = slice(0, bounds[k]), slice(bounds[k], bounds[k + 1])
+            print(f"🔁 Fold {k}: 训练 {self._window(train)[0]} → {self._window(train)[1]}"
+                  f" | 测试 {self._window(test)[0]} → {self._window(test)[1]}")
+            params, train_metrics = self.search(method, day_slice=train, **kwargs)
+            baseline, test_metrics = self.evaluate([default_params(), params], test)
+            rows.append({
+                "fold": k,
+                "train_start": self._window(train)[0], "train_end": self._window(train)[1],
+                "test_start": self._window(test)[0], "test_end": self._window(test)[1],
+                f"train_{self.objective}": train_metrics[self.objective],
+                f"test_{self.objective}": test_metrics[self.objective],
+                f"baseline_test_{self.objective}": baseline[self.objective],
+                "params": params,
+            })
+        return pd.DataFrame(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AIPT 相位阈值 / 仓位优化")
+    parser.add_argument("--method", choices=["grid", "random", "coordinate"], default="random")
+    parser.add_argument("--objective", choices=OBJECTIVES, default="sharpe")
+    parser.add_argument("--trials", type=int, default=2000, help="随机搜索试验次数")
+    parser.add_argument("--folds", type=int, default=0, help="walk-forward 折数（0 = 全区间搜索）")
+    parser.add_argument("--workers", type=int, default=None, help="并行进程数（默认 CPU 核数）")
+    parser.add_argument("--start", type=str, default=BACKTEST_START)
+    parser.add_argument("--end", type=str, default=BACKTEST_END)
+    parser.add_argument("--results", type=str, default=DEFAULT_RESULTS_PATH,
+                        help="试验记录 JSONL（已存在时续跑）")
+    parser.add_argument("--best", type=str, default=DEFAULT_BEST_PATH,
+                        help="最优参数输出 JSON（run_backtest.py --params 读取）")
+    args = parser.parse_args()
+
+    layer_returns, _ = prepare_returns()
+    layer_returns = layer_returns.loc[args.start:args.end]
+    check_baseline(layer_returns)
+
+    kwargs = {"n_trials": args.trials} if args.method == "random" else {}
+    store = TrialStore(args.results)
+    print(f"🧪 已有 {len(store.records)} 条试验记录: {args.results}")
+
+    with PhaseOptimizer(layer_returns, args.objective, args.workers, store) as opt:
+        if args.folds > 0:
+            report = opt.walk_forward(args.method, n_folds=args.folds, **kwargs)
+            print(report.drop(columns="params").to_string(index=False))
+            best = report.iloc[-1]["params"]
+        else:
+            best, metrics = opt.search(args.method, **kwargs)
+            baseline = opt.evaluate([default_params()])[0]
+            print(f"\n   默认参数 {args.objective}: {baseline[args.objective]:.4f}")
+            print(f"   最优参数 {args.objective}: {metrics[args.objective]:.4f}")
+
+    print("\n🏆 最优参数:")
+    for k, v in best.items():
+        print(f"   {k:14s} {v}")
+
+    os.makedirs(os.path.dirname(args.best) or ".", exist_ok=True)
+    with open(args.best, "w", encoding="utf-8") as f:
+        json.dump(best, f, ensure_ascii=False, indent=2)
+    print(f"\n   最优参数 → {args.best}（python run_backtest.py --params {args.best}）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+AIPT 列式价格库
+按日期索引的收盘价列式存储，内存映射读取，面向数千标的 × 数十年的价格矩阵。
+
+目录结构:
+    meta.json        标的列表 / dtype / 已写入行数 / 预分配容量 / 数据文件版本
+    dates.<v>.bin    int64 日期（ns 时间戳），长度 = 容量
+    values.<v>.bin   (标的数, 容量) 矩阵，每个标的一行连续存放（即列式）
+
+- 读取时只映射需要的标的 × 日期区间，其余部分不进内存；
+- 只允许按日期递增追加（每日增量写入），容量不足时翻倍扩容；
+- 扩容 / 新增标的写入新版本的数据文件，meta.json 原子替换是唯一的提交点：
+  中途崩溃时 meta 仍指向旧版本文件，尺寸与数据始终一致；
+- to_frame 在标的连续时零拷贝返回 engine 所需的 (日期 × 标的) DataFrame。
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+META_FILE = "meta.json"
+
+
+def _data_files(path: str, version: int) -> tuple:
+    """某一版本的 (日期文件, 数据文件) 路径；version 为 None 时是旧版无版本号布局。"""
+    suffix = "" if version is None else f".{version}"
+    return (os.path.join(path, f"dates{suffix}.bin"),
+            os.path.join(path, f"values{suffix}.bin"))
+
+
+class PriceStore:
+    """
+    内存映射列式价格库。
+
+    用法:
+        store = PriceStore.from_frame("cache/prices", closes)
+        store.append(new_closes)                       # 追加新交易日
+        closes = PriceStore("cache/prices").to_frame(["NVDA", "SPY"], start="2024-01-01")
+    """
+
+    def __init__(self, path: str, mode: str = "r"):
+        if mode not in ("r", "r+"):
+            raise ValueError("mode 只能是 'r'（只读）或 'r+'（可追加）")
+        self.path = path
+        self.mode = mode
+        with open(os.path.join(path, META_FILE), encoding="utf-8") as f:
+            meta = json.load(f)
+        self.tickers = list(meta["tickers"])
+        self.dtype = np.dtype(meta["dtype"])
+        self.rows = int(meta["rows"])
+        self.capacity = int(meta["capacity"])
+        self.version = meta.get("version")
+        self._positions = {t: i for i, t in enumerate(self.tickers)}
+        self._map()
+
+    # ── 创建 ─────────────────────────────────
+
+    @classmethod
+    def create(cls, path: str, tickers, dtype="float64", capacity: int = 4096) -> "PriceStore":
+        """创建空价格库（已存在时报错，避免误覆盖）。"""
+        if os.path.exists(os.path.join(path, META_FILE)):
+            raise FileExistsError(f"价格库已存在: {path}")
+        os.makedirs(path, exist_ok=True)
+        tickers = list(tickers)
+        if len(set(tickers)) != len(tickers):
+            raise ValueError("标的列表存在重复")
+        dtype = np.dtype(dtype)
+        _allocate(path, 0, len(tickers), capacity, dtype)
+        _write_meta(path, tickers, dtype, rows=0, capacity=capacity, version=0)
+        return cls(path, mode="r+")
+
+    @classmethod
+    def from_frame(cls, path: str, closes: pd.DataFrame, dtype="float64") -> "PriceStore":
+        """由 (日期 × 标的) 收盘价 DataFrame 建库。"""
+        store = cls.create(path, closes.columns, dtype, capacity=max(4096, len(closes)))
+        store.append(closes)
+        return store
+
+    # ── 读取 ─────────────────────────────────
+
+    def __len__(self):
+        return self.rows
+
+    @property
+    def dates(self) -> pd.DatetimeIndex:
+        return pd.DatetimeIndex(self._dates[:self.rows].view("datetime64[ns]"))
+
+    def _row_slice(self, start=None, end=None) -> slice:
+        dates = self._dates[:self.rows]
+        lo = 0 if start is None else int(np.searchsorted(dates, pd.Timestamp(start).value, "left"))
+        hi = self.rows if end is None else int(np.searchsorted(dates, pd.Timestamp(end).value, "right"))
+        return slice(lo, hi)
+
+    def _ticker_index(self, tickers):
+        """标的 → 行下标；连续区间返回 slice（零拷贝），否则返回下标数组。"""
+        if tickers is None:
+            return slice(0, len(self.tickers))
+        missing = [t for t in tickers if t not in self._positions]
+        if missing:
+            raise KeyError(f"价格库中没有标的: {', '.join(missing)}")
+        idx = np.array([self._positions[t] for t in tickers], dtype=int)
+        if len(idx) and np.array_equal(idx, np.arange(idx[0], idx[0] + len(idx))):
+            return slice(int(idx[0]), int(idx[0]) + len(idx))
+        return idx
+
+    def read(self, tickers=None, start=None, end=None) -> np.ndarray:
+        """返回 (标的, 日期) 数组；标的连续时为内存映射视图。"""
+        return self._values[self._ticker_index(tickers), self._row_slice(start, end)]
+
+    def to_frame(self, tickers=None, start=None, end=None) -> pd.DataFrame:
+        """
+        转为 engine 使用的 (日期 × 标的) 收盘价 DataFrame。
+        标的为 None 或在库中连续排列时不复制数据；任意子集只复制选中的列。
+        """
+        rows = self._row_slice(start, end)
+        columns = self.tickers if tickers is None else list(tickers)
+        values = self._values[self._ticker_index(tickers), rows]
+        index = pd.DatetimeIndex(self._dates[rows].view("datetime64[ns]"))
+        return pd.DataFrame(values.T, index=index, columns=columns, copy=False)
+
+    # ── 写入 ─────────────────────────────────
+
+    def append(self, closes: pd.DataFrame):
+        """
+        追加新交易日（日期必须严格晚于库中最后一天）。
+        closes 缺少的标的记为 NaN；出现库中没有的标的时先调用 add_tickers。
+        """
+        if self.mode != "r+":
+            raise PermissionError("只读模式无法追加，请使用 PriceStore(path, mode='r+')")
+        if closes.empty:
+            return
+        closes = closes.sort_index()
+        new_dates = pd.DatetimeIndex(closes.index).as_unit("ns").asi8
+        if np.any(np.diff(new_dates) <= 0):
+            raise ValueError("追加数据的日期存在重复")
+        if self.rows and new_dates[0] <= self._dates[self.rows - 1]:
+            raise ValueError(f"只允许追加晚于 {self.dates[-1].date()} 的数据")
+        unknown = [t for t in closes.columns if t not in self._positions]
+        if unknown:
+            raise KeyError(f"价格库中没有标的: {', '.join(unknown)}（先调用 add_tickers）")
+
+        needed = self.rows + len(new_dates)
+        if needed > self.capacity:
+            self._grow(self.tickers, capacity=max(needed, 2 * self.capacity))
+
+        rows = slice(self.rows, needed)
+        block = np.full((len(self.tickers), len(new_dates)), np.nan, dtype=self.dtype)
+        block[[self._positions[t] for t in closes.columns]] = closes.to_numpy(dtype=self.dtype).T
+        self._values[:, rows] = block
+        self._dates[rows] = new_dates
+        self._values.flush()
+        self._dates.flush()
+
+        # 数据落盘后再更新行数，中途中断不会暴露半写入的行
+        self.rows = needed
+        _write_meta(self.path, self.tickers, self.dtype, self.rows, self.capacity, self.version)
+
+    def add_tickers(self, tickers):
+        """新增标的（历史部分为 NaN）。需要重写 values 文件，属于低频操作。"""
+        if self.mode != "r+":
+            raise PermissionError("只读模式无法新增标的")
+        new = [t for t in tickers if t not in self._positions]
+        if not new:
+            return
+        self._grow(self.tickers + new, capacity=self.capacity)
+        self._positions = {t: i for i, t in enumerate(self.tickers)}
+
+    # ── 内部 ─────────────────────────────────
+
+    def _map(self):
+        mode = "r" if self.mode == "r" else "r+"
+        dates_file, values_file = _data_files(self.path, self.version)
+        self._dates = np.memmap(dates_file, dtype=np.int64, mode=mode, shape=(self.capacity,))
+        self._values = np.memmap(values_file, dtype=self.dtype, mode=mode,
+                                 shape=(len(self.tickers), self.capacity))
+
+    def _grow(self, tickers: list, capacity: int):
+        """
+        按新尺寸写出下一版本的数据文件并拷贝已写入部分；
+        meta.json 原子替换后才切换到新版本，随后删除旧版本文件。
+        """
+        version = (self.version or 0) + 1
+        n_tickers = len(tickers)
+        _allocate(self.path, version, n_tickers, capacity, self.dtype)
+        dates_file, values_file = _data_files(self.path, version)
+        dates = np.memmap(dates_file, dtype=np.int64, mode="r+", shape=(capacity,))
+        values = np.memmap(values_file, dtype=self.dtype, mode="r+", shape=(n_tickers, capacity))
+        dates[:self.rows] = self._dates[:self.rows]
+        values[:len(self.tickers), :self.rows] = self._values[:, :self.rows]
+        values[len(self.tickers):, :self.rows] = np.nan   # 新增标的的历史部分
+        dates.flush()
+        values.flush()
+        del dates, values, self._dates, self._values
+
+        # 提交点：meta 指向新版本
+        _write_meta(self.path, tickers, self.dtype, self.rows, capacity, version)
+        old_files = _data_files(self.path, self.version)
+        self.tickers, self.capacity, self.version = list(tickers), capacity, version
+        for old in old_files:
+            if os.path.exists(old):
+                os.remove(old)
+        self._map()
+
+
+def _allocate(path: str, version: int, n_tickers: int, capacity: int, dtype: np.dtype):
+    """预分配（稀疏）文件；rows 之后的部分不会被读取，无需初始化。"""
+    dates_file, values_file = _data_files(path, version)
+    with open(dates_file, "wb") as f:
+        f.truncate(capacity * 8)
+    with open(values_file, "wb") as f:
+        f.truncate(n_tickers * capacity * dtype.itemsize)
+
+
+def _write_meta(path: str, tickers, dtype: np.dtype, rows: int, capacity: int, version: int):
+    tmp = os.path.join(path, META_FILE + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"tickers": list(tickers), "dtype": dtype.name, "rows": rows,
+                   "capacity": capacity, "version": version}, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, os.path.join(path, META_FILE))
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+AIPT 本地雷达服务
+常驻进程：价格、五维指标、最近一次相位与仓位建议都保存在内存中，
+通过 localhost HTTP/JSON 接口查询；监视数据目录，新数据落地时增量刷新。
+
+数据目录（默认 cache/）:
+    radar_inputs.json    雷达原始输入（字段同 main.DEFAULT_INPUTS，可只给部分字段）
+    prices_*/            PriceStore 价格库（存在 NVDA 时用 200 日线自动计算 PCI）
+    phase_engine.json    相位引擎状态（服务写入，不参与监视）
+
+接口（GET）:
+    /phase /indicators /allocation /state /health
+    POST /reload 立即重新加载
+
+响应在数据刷新时预先序列化好，查询只返回缓存的字节串。
+
+用法:
+    python radar_service.py --dir cache --port 8765
+    curl http://127.0.0.1:8765/phase
+"""
+
+import argparse
+import glob
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+
+from allocation_mapper import allocation_by_phase
+from backtest_data import get_phase_allocation
+from indicators import compute_pci
+from main import DEFAULT_INPUTS, compute_indicators, hash_inputs
+from phase_classifier import classify_phase
+from phase_engine import PhaseEngine
+from price_store import PriceStore
+
+DEFAULT_DATA_DIR = os.path.join(os.path.dirname(__file__), "cache")
+INPUTS_FILE = "radar_inputs.json"
+STATE_FILE = "phase_engine.json"
+PCI_TICKER = "NVDA"
+PCI_LOOKBACK = 200
+
+
+class RadarState:
+    """
+    雷达内存状态：价格尾部窗口、指标、相位与仓位，以及预序列化的接口响应。
+    """
+
+    def __init__(self, data_dir: str = DEFAULT_DATA_DIR):
+        self.data_dir = data_dir
+        self.lock = threading.Lock()
+        self.engine = PhaseEngine.load(os.path.join(data_dir, STATE_FILE))
+        self.prices = None               # PCI 标的最近 PCI_LOOKBACK 个收盘价
+        self.price_rows = 0
+        self.inputs_hash = None
+        self.responses = {}
+        self.snapshot = {}
+        self.reloads = 0
+
+    # ── 数据加载 ─────────────────────────────
+
+    def _signatures(self) -> dict:
+        """被监视文件的 (mtime, size)，用于判断是否有新数据落地。"""
+        paths = [os.path.join(self.data_dir, INPUTS_FILE)]
+        paths += glob.glob(os.path.join(self.data_dir, "prices_*", "meta.json"))
+        sigs = {}
+        for path in paths:
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            sigs[path] = (st.st_mtime_ns, st.st_size)
+        return sigs
+
+    def _load_inputs(self) -> dict:
+        path = os.path.join(self.data_dir, INPUTS_FILE)
+        inputs = dict(DEFAULT_INPUTS)
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                inputs.update(json.load(f))
+        return inputs
+
+    def _refresh_prices(self) -> bool:
+        """增量读取价格库：只取上次之后新增的行，保留 PCI 所需的尾部窗口。"""
+        stores = glob.glob(os.path.join(self.data_dir, "prices_*", "meta.json"))
+        if not stores:
+            return False
+        # 取最近写入的价格库（旧命名的价格库目录可能仍残留在 cache/ 下）
+        store = PriceStore(os.path.dirname(max(stores, key=os.path.getmtime)))
+        if PCI_TICKER not in store.tickers or len(store) == self.price_rows:
+            return False
+        if self.prices is None or len(store) < self.price_rows:
+            start = None
+        else:
+            start = self.prices.index[-1] + pd.Timedelta(nanoseconds=1)
+        new = store.to_frame([PCI_TICKER], start=start)[PCI_TICKER].copy()
+        combined = new if start is None else pd.concat([self.prices, new])
+        # 价格库保存未填充的原始收盘价，缺失日沿用前值
+        self.prices = combined.ffill().iloc[-PCI_LOOKBACK:]
+        self.price_rows = len(store)
+        return True
+
+    def reload(self, force: bool = False) -> bool:
+        """
+        重新计算指标 / 相位 / 仓位，返回是否有更新。
+        相位引擎只在输入（含 PCI）变化时推进一次。
+        """
+        with self.lock:
+            prices_changed = self._refresh_prices()
+            inputs = self._load_inputs()
+            if self.prices is not None and len(self.prices) >= PCI_LOOKBACK:
+                inputs["pci"] = compute_pci(self.prices)
+
+            inputs_hash = hash_inputs(inputs)
+            if inputs_hash == self.inputs_hash and not (force or prices_changed):
+                return False
+
+            indicators = compute_indicators(inputs)
+            cpi, rdi, mqi, lpi, pci = (indicators[k] for k in ("CPI", "RDI", "MQI", "LPI", "PCI"))
+            phase = classify_phase(cpi, rdi, mqi, lpi, pci)
+            # 引擎状态里记录了最近一次已应用的输入哈希，重启后相同输入不会再推进
+            if self.engine.observe(cpi, rdi, mqi, lpi, inputs_hash, date=datetime.now()):
+                self.engine.save(os.path.join(self.data_dir, STATE_FILE))
+            self.inputs_hash = inputs_hash
+            self.reloads += 1
+
+            state_alloc = get_phase_allocation(self.engine.label)
+            self.snapshot = {
+                "phase": phase,
+                "state_phase": self.engine.label,
+                "indicators": indicators,
+                "allocation": allocation_by_phase(phase),
+                "state_allocation": {k: round(v * 100, 2) for k, v in state_alloc.items()},
+                "inputs": inputs,
+                "updated_at": datetime.now().isoformat(timespec="seconds"),
+                "price_rows": self.price_rows,
+                "reloads": self.reloads,
+            }
+            self._serialize()
+            return True
+
+    def _serialize(self):
+        s = self.snapshot
+        views = {
+            "/phase": {"phase": s["phase"], "state_phase": s["state_phase"],
+                       "updated_at": s["updated_at"]},
+            "/indicators": {"indicators": s["indicators"], "updated_at": s["updated_at"]},
+            "/allocation": {"phase": s["phase"], "allocation": s["allocation"],
+                            "state_phase": s["state_phase"],
+                            "state_allocation": s["state_allocation"]},
+            "/state": s,
+        }
+        self.responses = {path: json.dumps(body, ensure_ascii=False).encode("utf-8")
+                          for path, body in views.items()}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    state: RadarState = None
+
+    def _send(self, code: int, body: bytes):
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send(200, b'{"status": "ok"}')
+            return
+        body = self.state.responses.get(self.path)
+        if body is None:
+            self._send(404, json.dumps({"error": f"未知接口: {self.path}"},
+                                       ensure_ascii=False).encode("utf-8"))
+            return
+        self._send(200, body)
+
+    def do_POST(self):
+        if self.path != "/reload":
+            self._send(404, b'{"error": "not found"}')
+            return
+        self.state.reload(force=True)
+        self._send(200, self.state.responses["/state"])
+
+    def log_message(self, format, *args):
+        pass  # 查询频繁，不逐条打印访问日志
+
+
+class RadarService:
+    """
+    雷达服务：HTTP 服务线程 + 数据目录轮询线程。
+
+    用法:
+        service = RadarService("cache", port=0).start()
+        ...  # service.url 即服务地址
+        service.stop()
+    """
+
+    def __init__(self, data_dir: str = DEFAULT_DATA_DIR, host: str = "127.0.0.1",
+                 port: int = 8765, interval: float = 2.0):
+        os.makedirs(data_dir, exist_ok=True)
+        self.state = RadarState(data_dir)
+        self.interval = interval
+        handler = type("RadarHandler", (_Handler,), {"state": self.state})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self._stop = threading.Event()
+        self._threads = []
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "RadarService":
+        self.state.reload()
+        self._threads = [
+            threading.Thread(target=self.server.serve_forever, daemon=True),
+            threading.Thread(target=self._watch, daemon=True),
+        ]
+        for t in self._threads:
+            t.start()
+        return self
+
+    def _watch(self):
+        """轮询数据目录（不依赖第三方 watcher），文件变化时增量刷新。"""
+        last = self.state._signatures()
+        while not self._stop.wait(self.interval):
+            current = self.state._signatures()
+            if current != last:
+                last = current
+                if self.state.reload():
+                    print(f"🔄 {datetime.now():%H:%M:%S} 数据更新 → {self.state.snapshot['phase']}"
+                          f" / {self.state.snapshot['state_phase']}")
+
+    def stop(self):
+        self._stop.set()
+        self.server.shutdown()
+        self.server.server_close()
+        for t in self._threads:
+            t.join(timeout=self.interval + 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AIPT 本地雷达服务")
+    parser.add_argument("--dir", type=str, default=DEFAULT_DATA_DIR, help="监视的数据目录")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--interval", type=float, default=2.0, help="目录轮询间隔（秒）")
+    args = parser.parse_args()
+
+    service = RadarService(args.dir, port=args.port, interval=args.interval).start()
+    snap = service.state.snapshot
+    print(f"📡 AIPT 雷达服务已启动: {service.url}")
+    print(f"   当前相位: {snap['phase']} | 状态引擎: {snap['state_phase']}")
+    print(f"   监视目录: {args.dir}（Ctrl+C 退出）")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        service.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+AIPT 调仓频率与信号平滑
+- 调仓计划：bar（每根 K 线）/ daily / weekly / monthly / quarterly / signal（相位变化时）
+  或自定义日期列表；
+  两次调仓之间仓位随各层涨跌自然漂移；
+- 信号平滑：季度指标移动平均后交给相位引擎判定，或对相位做窗口多数投票。
+
+模拟不逐日循环：以调仓日切分区段，用累计对数收益在区段内做差得到各层净值增长，
+所有调仓方案都只是在同一份缓存的各层收益数组上换一套区段索引。
+"""
+
+import os
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from phase_engine import INDICATORS, PhaseEngine
+
+SCHEDULES = ("bar", "daily", "weekly", "monthly", "quarterly", "signal")
+
+
+def parse_schedule(spec: str):
+    """
+    解析调仓计划：内置名称原样返回；"file:<路径>" 读取日期文件（每行一个日期，
+    CSV 取第一列）；"dates:2024-06-03;2024-09-03" 直接给出日期列表。
+    """
+    if spec in SCHEDULES:
+        return spec
+    if spec.startswith("file:"):
+        path = spec[len("file:"):]
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"调仓日期文件不存在: {path}")
+        frame = pd.read_csv(path, header=None, comment="#")
+        dates = pd.to_datetime(frame.iloc[:, 0], errors="coerce").dropna()
+        return pd.DatetimeIndex(dates)
+    if spec.startswith("dates:"):
+        return pd.DatetimeIndex(pd.to_datetime(spec[len("dates:"):].split(";")))
+    raise ValueError(f"未知调仓计划: {spec}（可选: {', '.join(SCHEDULES)} / file:<路径> / dates:<日期;...>）")
+
+
+def rebalance_mask(dates: pd.DatetimeIndex, schedule, target: np.ndarray = None) -> np.ndarray:
+    """
+    每个交易日是否调仓（首日总是建仓）。
+
+    参数:
+        schedule: SCHEDULES 之一，或自定义日期（非交易日顺延到下一交易日）；
+                  日内数据下 daily 为每日首根 K 线调仓，bar 为每根 K 线调仓
+        target: (T, K) 目标仓位，schedule="signal" 时用于识别信号变化日
+    """
+    n = len(dates)
+    if isinstance(schedule, str):
+        if schedule == "bar":
+            mask = np.ones(n, dtype=bool)
+        elif schedule == "signal":
+            if target is None:
+                raise ValueError("signal 调仓需要提供目标仓位")
+            mask = np.r_[True, np.any(target[1:] != target[:-1], axis=1)]
+        else:
+            freq = {"daily": "D", "weekly": "W", "monthly": "M", "quarterly": "Q"}[schedule]
+            periods = dates.to_period(freq).asi8
+            mask = np.r_[True, periods[1:] != periods[:-1]]
+    else:
+        mask = np.zeros(n, dtype=bool)
+        pos = dates.searchsorted(pd.DatetimeIndex(schedule), side="left")
+        mask[pos[pos < n]] = True
+    mask[0] = True
+    return mask
+
+
+def smooth_phases(quarterly_data, smoothing: str = "none", phase_source: str = "labels") -> list:
+    """
+    季度相位序列（可带平滑）。
+
+    参数:
+        smoothing: "none" | "ma:N"（指标 N 季移动平均后由相位引擎判定，仅用于 phase_source="engine"）
+                   | "vote:N"（相位 N 季多数投票，平票时保持上一季投票结果）
+        phase_source: "labels"（QUARTERLY_DATA 手工相位）| "engine"（相位引擎判定）
+    """
+    mode, _, arg = smoothing.partition(":")
+    window = int(arg) if arg else 1
+    if mode not in ("none", "ma", "vote") or window < 1:
+        raise ValueError(f"未知信号平滑方式: {smoothing}（可选: none / ma:N / vote:N）")
+    if phase_source not in ("labels", "engine"):
+        raise ValueError(f"未知相位来源: {phase_source}（可选: labels / engine）")
+    if mode == "ma" and phase_source != "engine":
+        # 手工相位没有可平滑的判定过程，ma 只能重新由引擎判定，不能与 labels 混用
+        raise ValueError(f"{smoothing} 平滑作用于指标并由相位引擎判定，需配合 phase_source=engine")
+
+    frame = pd.DataFrame(
+        [{k: getattr(qd, k) for k in INDICATORS} for qd in quarterly_data],
+        index=pd.DatetimeIndex([qd.effective_date for qd in quarterly_data]),
+    )
+    if mode == "ma":
+        frame = frame.rolling(window, min_periods=1).mean()
+        return PhaseEngine().replay(frame)["label"].tolist()
+
+    if phase_source == "engine":
+        phases = PhaseEngine().replay(frame)["label"].tolist()
+    else:
+        phases = [qd.phase for qd in quarterly_data]
+
+    if mode == "vote" and window > 1:
+        voted = []
+        for i in range(len(phases)):
+            recent = phases[max(0, i - window + 1):i + 1]
+            counts = Counter(recent)
+            top = max(counts.values())
+            winners = [p for p in counts if counts[p] == top]
+            # 平票时保持上一季的投票结果（形成滞回）；首季或上一结果不在平票中时取最早出现的相位
+            if voted and voted[-1] in winners:
+                voted.append(voted[-1])
+            else:
+                voted.append(next(p for p in recent if p in winners))
+        phases = voted
+    return phases
+
+
+def simulate_rebalanced(returns: np.ndarray, target: np.ndarray, mask: np.ndarray):
+    """
+    按调仓计划模拟组合净值。
+
+    参数:
+        returns: (T, K) 各层日收益率（首日收益不计入，与 run_backtest 一致）
+        target: (T, K) 每日目标仓位；行和小于 1 的部分视为现金
+        mask: (T,) 调仓日
+
+    返回:
+        nav: (T,) 归一化净值（首日 = 1.0）
+        held: (T, K) 每日开盘实际持仓权重（调仓日 = 目标仓位，其余日期随收益漂移）
+        closing: (T, K) 每日收盘持仓权重（下一调仓日据此计算换手）
+    """
+    r = np.nan_to_num(np.asarray(returns, dtype=float))
+    r[0] = 0.0
+    n = len(r)
+
+    # 区段：每个调仓日开启一段，段内沿用该日目标仓位
+    idx = np.arange(n)
+    seg_start = np.maximum.accumulate(np.where(mask, idx, 0))
+    seg_id = np.cumsum(mask) - 1
+    w = target[seg_start]                                                 # (T, K)
+    cash = 1.0 - w.sum(axis=1)
+
+    # 各层从区段起点到当日（含）的净值增长
+    log_cum = np.vstack([np.zeros((1, r.shape[1])), np.cumsum(np.log1p(r), axis=0)])
+    growth = np.exp(log_cum[idx + 1] - log_cum[seg_start])               # (T, K)
+    seg_value = (w * growth).sum(axis=1) + cash                          # 段内相对净值
+
+    # 段末净值连乘得到各段起点净值
+    seg_end = np.r_[mask[1:], True]
+    end_values = seg_value[seg_end]
+    seg_base = np.r_[1.0, np.cumprod(end_values)[:-1]]
+    nav = seg_base[seg_id] * seg_value
+
+    # 开盘持仓 = 区段权重 × 截至前一日的增长；收盘持仓 = 区段权重 × 截至当日的增长
+    prev_growth = np.exp(log_cum[idx] - log_cum[seg_start])
+    prev_value = (w * prev_growth).sum(axis=1) + cash
+    held = w * prev_growth / prev_value[:, None]
+    closing = w * growth / seg_value[:, None]
+    return nav, held, closing
@@ -1,10 +1,12 @@
 # 报告输出：当前相位、指标与建议仓位
 
 
-def generate_report(phase, allocations, indicators):
-    """打印 AI 周期报告到控制台。"""
+def generate_report(phase, allocations, indicators, state_phase=None):
+    """打印 AI 周期报告到控制台。state_phase 为相位引擎（转移图）给出的相位。"""
     print("========== AI Cycle Report ==========")
     print(f"Current Phase: {phase}")
+    if state_phase is not None:
+        print(f"State Engine Phase: {state_phase}")
     print("\nIndicators:")
     for k, v in indicators.items():
         print(f"  {k}: {v}")
@@ -0,0 +1,149 @@
+"""
+AIPT 回测结果缓存（内容寻址）
+以全部输入的稳定哈希为键：价格快照、季度数据、仓位表、区间、选项与引擎版本，
+任一输入变化即自动失效；结果以 zlib 压缩的 pickle 存放在 cache/ 下，
+按总大小做 LRU 淘汰（命中时刷新文件 mtime，淘汰 mtime 最旧的条目）。
+
+用法:
+    cache = ResultCache()
+    key = stable_hash({"version": ENGINE_VERSION, "returns": layer_returns, ...})
+    results = cache.get(key)
+    if results is None:
+        results = ...
+        cache.put(key, results)
+"""
+
+import dataclasses
+import glob
+import hashlib
+import os
+import pickle
+import tempfile
+import zlib
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(__file__), "cache", "backtest_results")
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def _feed(h, obj):
+    """把对象按类型写入哈希器；DataFrame / ndarray 直接哈希底层字节，不做序列化。"""
+    if isinstance(obj, pd.DataFrame):
+        h.update(b"df")
+        _feed(h, obj.index)
+        _feed(h, [str(c) for c in obj.columns])
+        _feed(h, obj.to_numpy())
+    elif isinstance(obj, pd.Series):
+        h.update(b"series")
+        _feed(h, obj.index)
+        _feed(h, str(obj.name))
+        _feed(h, obj.to_numpy())
+    elif isinstance(obj, pd.Index):
+        h.update(b"index")
+        _feed(h, obj.asi8 if isinstance(obj, pd.DatetimeIndex) else obj.to_numpy())
+    elif isinstance(obj, np.ndarray):
+        if obj.dtype == object:
+            _feed(h, obj.tolist())
+        else:
+            h.update(f"nd{obj.dtype.str}{obj.shape}".encode())
+            h.update(np.ascontiguousarray(obj).tobytes())
+    elif isinstance(obj, dict):
+        h.update(b"dict")
+        for k in sorted(obj, key=str):
+            _feed(h, str(k))
+            _feed(h, obj[k])
+    elif isinstance(obj, (list, tuple)):
+        h.update(f"seq{len(obj)}".encode())
+        for item in obj:
+            _feed(h, item)
+    elif dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        h.update(type(obj).__name__.encode())
+        _feed(h, dataclasses.asdict(obj))
+    else:
+        h.update(f"{type(obj).__name__}:{obj!r};".encode("utf-8"))
+
+
+def stable_hash(obj) -> str:
+    """任意嵌套输入 → 与进程无关的稳定 sha256 十六进制串。"""
+    h = hashlib.sha256()
+    _feed(h, obj)
+    return h.hexdigest()
+
+
+class ResultCache:
+    """
+    磁盘结果缓存：每个键一个 <key>.pkl.z 文件，总大小超过 max_bytes 时按 mtime 淘汰。
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.pkl.z")
+
+    def get(self, key: str):
+        """命中返回结果并刷新 mtime；未命中或文件损坏返回 None。"""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                payload = f.read()
+            value = pickle.loads(zlib.decompress(payload))
+        except FileNotFoundError:
+            return None
+        except (zlib.error, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            # 损坏或旧版本对象无法还原：当作未命中，下次 put 覆盖
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass                    # 已被其他进程删除 / 淘汰
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass                        # 读取后被其他进程淘汰，结果仍有效
+        return value
+
+    def put(self, key: str, value) -> str:
+        """原子写入结果，随后按大小淘汰最久未用的条目。"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        payload = zlib.compress(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), 6)
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, prefix=".tmp_")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(payload)
+            os.replace(tmp, self._path(key))
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        self.evict()
+        return self._path(key)
+
+    def evict(self) -> int:
+        """总大小超过上限时从 mtime 最旧的条目开始删除，返回删除条数。"""
+        entries = []
+        for path in glob.glob(os.path.join(self.cache_dir, "*.pkl.z")):
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime_ns, st.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        return removed
+
+    def clear(self):
+        for path in glob.glob(os.path.join(self.cache_dir, "*.pkl.z")):
+            os.remove(path)
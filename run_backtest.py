@@ -6,12 +6,165 @@ AIPT 实盘回测入口
     python run_backtest.py                          # 使用默认区间
     python run_backtest.py --start 2024-04-01       # 指定起始日
     python run_backtest.py --start 2025-01-02 --end 2026-02-27
+    python run_backtest.py --phase-source engine    # 使用相位引擎判定相位
+    python run_backtest.py --rebalance monthly      # 每月调仓，期间仓位自然漂移
+    python run_backtest.py --rebalance daily,weekly,monthly,signal --smoothing none,vote:2
+                                                    # 多组调仓 / 平滑方案并排对比
+    python run_backtest.py --windows-file backtest_windows.txt
+                                                    # 批量区间：数据只加载一次，报告并行生成
+    python run_backtest.py --windows 2024-04-01:2026-02-26,2025-04-01:2026-02-26
+    python run_backtest.py --no-cache                # 忽略回测结果缓存，强制重新计算
+    python run_backtest.py --update-prices           # 先把新交易日追加进本地价格库
+    python run_backtest.py --params optimizer_output/best_params.json
+                                                    # 回测 phase_optimizer 的最优阈值 / 仓位
 """
 
 import argparse
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
 from backtest_data import BACKTEST_START, BACKTEST_END
-from backtest_engine import run_backtest
-from backtest_report import generate_backtest_report
+from backtest_engine import (
+    run_backtest, compare_rebalance_schedules, prepare_returns, update_prices,
+)
+from backtest_report import generate_backtest_report, BASE_OUTPUT_DIR
+
+
+def load_signals(path: str) -> tuple:
+    """读取 phase_optimizer 输出的参数 JSON → (季度数据, 仓位表)。"""
+    from phase_optimizer import params_to_quarterly
+
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"参数文件不存在: {path}")
+    with open(path, encoding="utf-8") as f:
+        return params_to_quarterly(json.load(f))
+
+
+def compare_schedules(args, rebalances, smoothings):
+    """一次加载数据，对比多组调仓计划 × 信号平滑。"""
+    layer_returns, _ = prepare_returns()
+    layer_returns = layer_returns.loc[args.start:args.end]
+
+    table = compare_rebalance_schedules(layer_returns, rebalances, smoothings, args.phase_source)
+
+    print("📋 调仓方案对比")
+    print(table.to_string(index=False, float_format=lambda x: f"{x:.4f}"))
+
+    output_dir = os.path.join(BASE_OUTPUT_DIR, f"{args.start}_{args.end}")
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, "rebalance_comparison.csv")
+    table.to_csv(path, index=False)
+    print(f"\n   对比表 → {path}")
+
+
+def parse_windows(spec: str = None, path: str = None) -> list:
+    """
+    解析回测区间列表：--windows "起:止,起:止" 与 --windows-file（每行一个区间，
+    起止日期以空白 / 冒号 / 逗号分隔，# 开头为注释）。
+    """
+    items = spec.split(",") if spec else []
+    if path:
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"区间文件不存在: {path}")
+        with open(path, encoding="utf-8") as f:
+            items += [line.split("#")[0] for line in f]
+
+    windows = []
+    for item in items:
+        if not item.strip():
+            continue
+        parts = re.split(r"[\s:,]+", item.strip())
+        if len(parts) != 2:
+            raise ValueError(f"无法解析回测区间: {item.strip()}（格式: 起始日:结束日）")
+        start, end = (str(pd.Timestamp(d).date()) for d in parts)
+        if start >= end:
+            raise ValueError(f"回测区间起始日须早于结束日: {item.strip()}")
+        if (start, end) not in windows:
+            windows.append((start, end))
+    return windows
+
+
+def _report_window(results: dict, subdir: str) -> str:
+    generate_backtest_report(results, subdir=subdir)
+    return subdir
+
+
+def summarize_windows(all_results: dict) -> pd.DataFrame:
+    """各区间回测结果 → 汇总表（每行一个区间）。"""
+    rows = []
+    for (start, end), results in all_results.items():
+        s = results["stats"]
+        rows.append({
+            "window": f"{start} ~ {end}",
+            "days": s["trading_days"],
+            "final_value": s["portfolio_final"],
+            "total_return": s["portfolio_total_return"],
+            "annual_return": s["portfolio_annual_return"],
+            "max_drawdown": s["portfolio_max_drawdown"],
+            "volatility": s["portfolio_volatility"],
+            "sharpe": s["portfolio_sharpe"],
+            "benchmark_return": s["benchmark_total_return"],
+            "benchmark_max_drawdown": s["benchmark_max_drawdown"],
+            "benchmark_sharpe": s["benchmark_sharpe"],
+            "excess_return": s["excess_return"],
+        })
+    return pd.DataFrame(rows)
+
+
+def _summary_markdown(table: pd.DataFrame) -> str:
+    lines = [
+        "| 区间 | 终值 | 总收益率 | 年化收益率 | 最大回撤 | 夏普 | SPY 收益率 | SPY 回撤 | 超额收益 |",
+        "|:---|---:|---:|---:|---:|---:|---:|---:|---:|",
+    ]
+    for row in table.itertuples(index=False):
+        lines.append(
+            f"| {row.window} | ${row.final_value:,.0f} | {row.total_return:+.2%} "
+            f"| {row.annual_return:+.2%} | {row.max_drawdown:.2%} | {row.sharpe:.2f} "
+            f"| {row.benchmark_return:+.2%} | {row.benchmark_max_drawdown:.2%} "
+            f"| {row.excess_return:+.2%} |")
+    return "\n".join(lines) + "\n"
+
+
+def run_windows(args, windows, workers: int = None):
+    """
+    批量回测多个区间：价格与各层收益只计算一次，各区间在共享数组上切片求值，
+    再并行生成各区间报告，最后输出汇总表。
+    """
+    print("=" * 60)
+    print(f"🚀 AIPT 批量回测: {len(windows)} 个区间")
+    print("=" * 60)
+
+    returns = prepare_returns()
+    all_results = {}
+    for start, end in windows:
+        print(f"\n── {start} → {end} " + "─" * 30)
+        all_results[(start, end)] = run_backtest(
+            start_date=start, end_date=end, phase_source=args.phase_source,
+            rebalance=args.rebalance, smoothing=args.smoothing, returns=returns,
+            cache=not args.no_cache, signals=args.signals)
+
+    # 报告绘图互不依赖，按区间并行
+    with ProcessPoolExecutor(max_workers=workers or min(len(windows), os.cpu_count() or 1)) as pool:
+        futures = [pool.submit(_report_window, results, f"{start}_{end}")
+                   for (start, end), results in all_results.items()]
+        for future in futures:
+            future.result()
+
+    table = summarize_windows(all_results)
+    os.makedirs(BASE_OUTPUT_DIR, exist_ok=True)
+    csv_path = os.path.join(BASE_OUTPUT_DIR, "summary.csv")
+    md_path = os.path.join(BASE_OUTPUT_DIR, "summary.md")
+    table.to_csv(csv_path, index=False)
+    with open(md_path, "w", encoding="utf-8") as f:
+        f.write(_summary_markdown(table))
+
+    print("\n📋 区间汇总")
+    print(table.to_string(index=False, float_format=lambda x: f"{x:.4f}"))
+    print(f"\n🎯 批量回测完成！汇总表 → {md_path} / {csv_path}")
 
 
 def main():
@@ -20,7 +173,49 @@ def main():
                         help=f"回测起始日期 (默认: {BACKTEST_START})")
     parser.add_argument("--end", type=str, default=BACKTEST_END,
                         help=f"回测结束日期 (默认: {BACKTEST_END})")
+    parser.add_argument("--phase-source", choices=["labels", "engine"], default="labels",
+                        help="相位来源: labels=季度手工标注, engine=相位引擎按转移图判定")
+    parser.add_argument("--rebalance", type=str, default="daily",
+                        help="调仓计划，逗号分隔可对比多组: daily / weekly / monthly / quarterly / "
+                             "signal / file:<日期文件> / dates:<日期;...> (默认: daily)")
+    parser.add_argument("--smoothing", type=str, default="none",
+                        help="信号平滑，逗号分隔可对比多组: none / ma:N / vote:N (默认: none)；"
+                             "ma:N 对指标做移动平均后由相位引擎判定，需 --phase-source engine")
+    parser.add_argument("--windows", type=str, default=None,
+                        help="批量回测区间，逗号分隔: 起始日:结束日,... (覆盖 --start/--end)")
+    parser.add_argument("--windows-file", type=str, default=None,
+                        help="批量回测区间文件，每行一个区间，如 backtest_windows.txt")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="批量回测时并行生成报告的进程数 (默认: 区间数与 CPU 数取小)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="不读写回测结果缓存 (cache/backtest_results/)")
+    parser.add_argument("--update-prices", action="store_true",
+                        help="回测前增量拉取本地价格库之后的新交易日 (默认只读本地价格库)")
+    parser.add_argument("--params", type=str, default=None,
+                        help="phase_optimizer 输出的参数 JSON，按其阈值 / 仓位回测 "
+                             "(覆盖 --phase-source / --smoothing)")
     args = parser.parse_args()
+    batch = bool(args.windows or args.windows_file)
+    if batch and ("," in args.rebalance or "," in args.smoothing):
+        parser.error("批量区间回测只支持单一 --rebalance / --smoothing，多组对比请分别按区间运行")
+    args.signals = load_signals(args.params) if args.params else None
+    if args.update_prices:
+        update_prices()
+
+    if batch:
+        windows = parse_windows(args.windows, args.windows_file)
+        if not windows:
+            parser.error("未给出任何回测区间")
+        run_windows(args, windows, workers=args.workers)
+        return
+
+    rebalances = args.rebalance.split(",")
+    smoothings = args.smoothing.split(",")
+    if len(rebalances) > 1 or len(smoothings) > 1:
+        if args.params:
+            parser.error("--params 不支持多组调仓 / 平滑对比")
+        compare_schedules(args, rebalances, smoothings)
+        return
 
     start_date = args.start
     end_date = args.end
@@ -33,7 +228,10 @@ def main():
     print()
 
     # 1. 运行回测引擎
-    results = run_backtest(start_date=start_date, end_date=end_date)
+    results = run_backtest(start_date=start_date, end_date=end_date,
+                           phase_source=args.phase_source,
+                           rebalance=args.rebalance, smoothing=args.smoothing,
+                           cache=not args.no_cache, signals=args.signals)
 
     # 2. 生成可视化报告（保存到以区间命名的子目录）
     subdir = f"{start_date}_{end_date}"
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+AIPT 情景扫描（可续跑、分片）
+将情景空间（回测区间 × 阈值 × 仓位倾斜 …）切成分片，由本地多进程并行计算；
+每个分片完成后原子写入 checkpoint 目录，中断后重新运行会跳过已完成分片，
+最后合并为一张结果表。
+
+各层收益矩阵只写一次 .npy，工作进程以内存映射方式只读共享，不再各自 pickle 一份。
+
+情景空间文件（JSON）示例:
+    {
+        "start": ["2024-04-01", "2025-04-01"],
+        "end": ["2026-02-26"],
+        "phases": ["labels", "classifier"],
+        "tilt_p1": [-0.05, 0, 0.05],
+        "p2_rdi_max": [30, 45]
+    }
+
+可用参数: start / end / phases（labels / classifier）/ phase_classifier.DEFAULT_THRESHOLDS 中的阈值 /
+phase_optimizer.TILT_PARAMS 中的仓位倾斜。调仓计划与信号平滑不在批量模拟范围内，
+请用 run_backtest.py 对比；未知参数直接报错，避免结果表列出实际未生效的变体。
+
+用法:
+    python sweep_runner.py --spec sweep.json --checkpoint-dir sweep_output/run1 --workers 8
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from backtest_data import QUARTERLY_DATA, BACKTEST_START, BACKTEST_END
+from backtest_engine import prepare_returns
+from backtest_vectorized import LAYERS, quarter_index, allocation_matrix, simulate_batch, batch_stats
+from phase_classifier import DEFAULT_THRESHOLDS
+from phase_optimizer import TILT_PARAMS, data_signature, params_to_weights, tilted_allocations
+
+DEFAULT_CHECKPOINT_DIR = os.path.join(os.path.dirname(__file__), "sweep_output")
+SCENARIO_KEYS = {"start", "end", "phases", *DEFAULT_THRESHOLDS, *TILT_PARAMS}
+PHASE_SOURCES = ("labels", "classifier")
+
+
+def expand_scenarios(spec: dict) -> list:
+    """情景空间 {参数: [取值...]} → 笛卡尔积展开的情景列表（参数名与 phases 取值先校验）。"""
+    unknown = sorted(set(spec) - SCENARIO_KEYS)
+    if unknown:
+        raise ValueError(f"情景空间包含不支持的参数: {', '.join(unknown)}"
+                         f"（可选: {', '.join(sorted(SCENARIO_KEYS))}）")
+    bad = [v for v in spec.get("phases", []) if v not in PHASE_SOURCES]
+    if bad:
+        raise ValueError(f"未知 phases 取值: {', '.join(map(str, bad))}（可选: labels / classifier）")
+    keys = sorted(spec)
+    return [dict(zip(keys, values)) for values in itertools.product(*(spec[k] for k in keys))]
+
+
+def scenario_weights(scenario: dict) -> np.ndarray:
+    """
+    情景 → (Q, 5) 季度仓位矩阵。
+    phases="labels"（默认）沿用 QUARTERLY_DATA 手工相位，"classifier" 按情景阈值重新判定。
+    """
+    if scenario.get("phases", "labels") == "classifier":
+        return params_to_weights(scenario)
+    return allocation_matrix([qd.phase for qd in QUARTERLY_DATA], tilted_allocations(scenario))
+
+
+def write_json_atomic(path: str, payload):
+    """先写临时文件再 os.replace，保证 checkpoint 文件要么完整要么不存在。"""
+    directory = os.path.dirname(path) or "."
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".tmp_", suffix=".json")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def _shard_path(checkpoint_dir: str, shard_id: int) -> str:
+    return os.path.join(checkpoint_dir, f"shard_{shard_id:05d}.json")
+
+
+def _run_shard(checkpoint_dir: str, shard_id: int, scenarios: list) -> int:
+    """工作进程：内存映射读取收益矩阵，计算一个分片并落盘。"""
+    returns = np.load(os.path.join(checkpoint_dir, "returns.npy"), mmap_mode="r")
+    dates = pd.DatetimeIndex(np.load(os.path.join(checkpoint_dir, "dates.npy")))
+    qidx = quarter_index(dates)
+
+    rows = [None] * len(scenarios)
+    # 同一回测区间的情景合并为一次批量模拟
+    windows = {}
+    for i, sc in enumerate(scenarios):
+        windows.setdefault((sc.get("start", BACKTEST_START), sc.get("end", BACKTEST_END)), []).append(i)
+
+    for (start, end), members in windows.items():
+        lo = dates.searchsorted(pd.Timestamp(start), side="left")
+        hi = dates.searchsorted(pd.Timestamp(end), side="right")
+        if hi - lo < 2:
+            for i in members:
+                rows[i] = {**scenarios[i], "error": "回测区间内无数据"}
+            continue
+        weights = np.stack([scenario_weights(scenarios[i]) for i in members])
+        nav = simulate_batch(returns[lo:hi], qidx[lo:hi], weights)
+        stats = batch_stats(nav)
+        for j, i in enumerate(members):
+            rows[i] = {**scenarios[i], **{k: float(v[j]) for k, v in stats.items()}}
+
+    write_json_atomic(_shard_path(checkpoint_dir, shard_id), rows)
+    return shard_id
+
+
+class SweepRunner:
+    """
+    分片情景扫描。
+
+    参数:
+        checkpoint_dir: checkpoint 目录（manifest / 收益矩阵 / 分片结果）
+        shard_size: 每个分片包含的情景数
+        workers: 并行进程数
+    """
+
+    def __init__(self, checkpoint_dir: str = DEFAULT_CHECKPOINT_DIR, shard_size: int = 200,
+                 workers: int = None):
+        self.checkpoint_dir = checkpoint_dir
+        self.shard_size = shard_size
+        self.workers = workers if workers is not None else os.cpu_count()
+
+    def _prepare(self, scenarios: list, layer_returns: pd.DataFrame) -> list:
+        """写入（或校验）manifest 与共享收益矩阵，返回分片列表。"""
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        returns = np.ascontiguousarray(layer_returns[LAYERS].to_numpy(dtype=float))
+        # 收益矩阵 + 季度数据 + 仓位表：任一变化都使已完成的分片失效
+        data_hash = data_signature(layer_returns)
+        scenario_hash = hashlib.sha1(
+            json.dumps(scenarios, sort_keys=True).encode("utf-8")).hexdigest()
+
+        manifest_path = os.path.join(self.checkpoint_dir, "manifest.json")
+        if os.path.exists(manifest_path):
+            with open(manifest_path, encoding="utf-8") as f:
+                manifest = json.load(f)
+            if (manifest["data_hash"], manifest["scenario_hash"], manifest["shard_size"]) != \
+                    (data_hash, scenario_hash, self.shard_size):
+                raise ValueError(f"checkpoint 目录 {self.checkpoint_dir} 属于另一次扫描"
+                                 f"（数据 / 情景 / 分片大小不一致），请换目录或清空后重跑")
+        else:
+            np.save(os.path.join(self.checkpoint_dir, "returns.npy"), returns)
+            np.save(os.path.join(self.checkpoint_dir, "dates.npy"), layer_returns.index.values)
+            write_json_atomic(manifest_path, {
+                "data_hash": data_hash,
+                "scenario_hash": scenario_hash,
+                "shard_size": self.shard_size,
+                "n_scenarios": len(scenarios),
+            })
+
+        return [scenarios[i:i + self.shard_size] for i in range(0, len(scenarios), self.shard_size)]
+
+    def run(self, scenarios: list, layer_returns: pd.DataFrame) -> pd.DataFrame:
+        """执行（或续跑）扫描，返回合并后的结果表。"""
+        shards = self._prepare(scenarios, layer_returns)
+        todo = [i for i in range(len(shards))
+                if not os.path.exists(_shard_path(self.checkpoint_dir, i))]
+        print(f"🧩 共 {len(shards)} 个分片，已完成 {len(shards) - len(todo)}，待计算 {len(todo)}")
+
+        if todo:
+            if self.workers <= 1:
+                for i in todo:
+                    _run_shard(self.checkpoint_dir, i, shards[i])
+                    print(f"   ✅ 分片 {i} 完成")
+            else:
+                with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                    futures = [pool.submit(_run_shard, self.checkpoint_dir, i, shards[i])
+                               for i in todo]
+                    for done, future in enumerate(as_completed(futures), 1):
+                        print(f"   ✅ 分片 {future.result()} 完成 ({done}/{len(todo)})")
+
+        return self.merge(len(shards))
+
+    def merge(self, n_shards: int) -> pd.DataFrame:
+        """合并全部分片为一张结果表，并写出 results.csv。"""
+        rows = []
+        for i in range(n_shards):
+            with open(_shard_path(self.checkpoint_dir, i), encoding="utf-8") as f:
+                rows.extend(json.load(f))
+        results = pd.DataFrame(rows)
+        path = os.path.join(self.checkpoint_dir, "results.csv")
+        results.to_csv(path, index=False)
+        print(f"📄 合并结果 {len(results)} 行 → {path}")
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AIPT 可续跑分片情景扫描")
+    parser.add_argument("--spec", type=str, required=True, help="情景空间 JSON 文件")
+    parser.add_argument("--checkpoint-dir", type=str, default=DEFAULT_CHECKPOINT_DIR)
+    parser.add_argument("--shard-size", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=None, help="并行进程数（默认 CPU 核数）")
+    parser.add_argument("--sort-by", type=str, default="sharpe", help="结果排序指标")
+    args = parser.parse_args()
+
+    with open(args.spec, encoding="utf-8") as f:
+        scenarios = expand_scenarios(json.load(f))
+
+    layer_returns, _ = prepare_returns()
+    runner = SweepRunner(args.checkpoint_dir, args.shard_size, args.workers)
+    results = runner.run(scenarios, layer_returns)
+
+    if args.sort_by in results.columns:
+        results = results.sort_values(args.sort_by, ascending=False)
+    print(results.head(20).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()